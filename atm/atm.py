@@ -1,7 +1,26 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from threading import Lock
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Condition, Event, Lock, Thread
+import asyncio
+import contextlib
 import datetime
+import itertools
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # The ATM system should support basic operations such as balance inquiry, cash withdrawal, and cash deposit.
 # Users should be able to authenticate themselves using a card and a PIN (Personal Identification Number).
@@ -40,18 +59,451 @@ class Account:
         self.balance -= amount
 
 
+class AccountRow:
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def get_account_number(self):
+        return self.store.account_numbers[self.row]
+
+    def get_balance(self):
+        return self.store.balances[self.row] / 100
+
+    def get_balance_cents(self):
+        return self.store.balances[self.row]
+
+    def deposit(self, amount):
+        self.store.balances[self.row] += to_cents(amount)
+
+    def withdraw(self, amount):
+        self.store.balances[self.row] -= to_cents(amount)
+
+
+def to_cents(amount):
+    return int(round(amount * 100))
+
+
+class ColumnarAccountStore:
+    def __init__(self, capacity=1024):
+        # Open-addressing hash index: each slot holds row + 1 (0 means empty), probed linearly.
+        self.slots = array("q", bytes(8 * capacity))
+        self.account_numbers = []
+        self.balances = array("q")
+        self.lock = Lock()
+
+    # Drop-in for the accounts dict: assigning an Account stores its number and balance as a new row,
+    # and lookups hand back a light AccountRow view over the balance column.
+    def __setitem__(self, account_number, account):
+        self.add(account_number, account.get_balance())
+
+    # Readers take no lock: they probe one snapshot of the index, which _reserve replaces only once
+    # the new table is fully built.
+    def __getitem__(self, account_number):
+        slots = self.slots
+        row = slots[self._find_slot(account_number, slots)] - 1
+        if row < 0:
+            raise KeyError(account_number)
+        return AccountRow(self, row)
+
+    def __contains__(self, account_number):
+        slots = self.slots
+        return slots[self._find_slot(account_number, slots)] != 0
+
+    def __len__(self):
+        return len(self.account_numbers)
+
+    def add(self, account_number, balance):
+        with self.lock:
+            slot = self._find_slot(account_number)
+            if self.slots[slot]:
+                self.balances[self.slots[slot] - 1] = to_cents(balance)
+                return
+            self._insert(slot, account_number, balance)
+
+    def add_many(self, account_numbers, balances):
+        with self.lock:
+            self._reserve(len(self.account_numbers) + len(account_numbers))
+            for account_number, balance in zip(account_numbers, balances):
+                slot = self._find_slot(account_number)
+                if self.slots[slot]:
+                    raise Exception("Account already exists")
+                self._insert(slot, account_number, balance)
+
+    def items(self):
+        return ((number, AccountRow(self, row)) for row, number in enumerate(self.account_numbers))
+
+    def values(self):
+        return (AccountRow(self, row) for row in range(len(self.account_numbers)))
+
+    def get_total_balance(self):
+        if numpy is not None:
+            return int(numpy.frombuffer(self.balances, dtype=numpy.int64).sum()) / 100
+        return sum(self.balances) / 100
+
+    def get_accounts_below(self, threshold):
+        threshold = to_cents(threshold)
+        if numpy is not None:
+            rows = numpy.flatnonzero(numpy.frombuffer(self.balances, dtype=numpy.int64) < threshold)
+        else:
+            rows = [row for row, balance in enumerate(self.balances) if balance < threshold]
+        return [self.account_numbers[row] for row in rows]
+
+    def _find_slot(self, account_number, slots=None):
+        if slots is None:
+            slots = self.slots
+        mask = len(slots) - 1
+        slot = hash(account_number) & mask
+        while True:
+            row = slots[slot] - 1
+            if row < 0 or self.account_numbers[row] == account_number:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _insert(self, slot, account_number, balance):
+        self.account_numbers.append(account_number)
+        self.balances.append(to_cents(balance))
+        self.slots[slot] = len(self.account_numbers)
+        if len(self.account_numbers) * 2 > len(self.slots):
+            self._reserve(len(self.account_numbers) * 2)
+
+    # Keeps the load factor at or below one half.
+    def _reserve(self, count):
+        capacity = len(self.slots)
+        while capacity < count * 2:
+            capacity *= 2
+        if capacity == len(self.slots):
+            return
+        slots = array("q", bytes(8 * capacity))
+        for row, account_number in enumerate(self.account_numbers):
+            slots[self._find_slot(account_number, slots)] = row + 1
+        self.slots = slots
+
+
+class JournalRecordType:
+    CREATE = 1
+    DEPOSIT = 2
+    WITHDRAW = 3
+    TRANSFER = 4
+
+
+class TransactionJournal:
+    # Log record: LSN (Q), record type (B), amount (d), account number length (H), counterparty length (H), then both strings.
+    RECORD = struct.Struct("<QBdHH")
+    # Snapshot: LSN (Q) and account count (Q), then per account: balance (d), account number length (H), account number.
+    SNAPSHOT_HEADER = struct.Struct("<QQ")
+    SNAPSHOT_ENTRY = struct.Struct("<dH")
+
+    def __init__(self, directory, snapshot_every=100000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+        self.lsn = 0
+        self.durable_lsn = 0
+        self.records_since_snapshot = 0
+        self.pending = []
+        self.file = None
+        self.closed = False
+        self.lock = Lock()
+        self.sync_lock = Lock()
+        self.appended = Condition(self.lock)
+        self.durable = Condition(self.lock)
+        self.flusher = None
+
+    # Any existing segment named after the next LSN can only hold a torn record, so it is truncated.
+    def open(self, lsn):
+        self.lsn = lsn
+        self.durable_lsn = lsn
+        self.file = open(self._segment_path(lsn + 1), "wb")
+        self.flusher = Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+
+    def append(self, record_type, account_number, amount, counterparty="") -> int:
+        account = account_number.encode("utf-8")
+        other = counterparty.encode("utf-8")
+        with self.lock:
+            self.lsn += 1
+            self.pending.append(self.RECORD.pack(self.lsn, record_type, amount, len(account), len(other)) + account + other)
+            self.records_since_snapshot += 1
+            self.appended.notify()
+            return self.lsn
+
+    def wait_durable(self, lsn):
+        with self.lock:
+            while self.durable_lsn < lsn:
+                self.durable.wait()
+
+    def needs_snapshot(self):
+        return self.records_since_snapshot >= self.snapshot_every
+
+    # Called with every account lock held, so `balances` matches exactly the records up to the current LSN.
+    # New records go to a fresh segment; older segments are dropped once the snapshot is on disk.
+    def start_snapshot(self):
+        with self.sync_lock, self.lock:
+            snapshot_lsn = self.lsn
+            if self.pending:
+                self.file.write(b"".join(self.pending))
+                self.pending = []
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = open(self._segment_path(snapshot_lsn + 1), "ab")
+            self.records_since_snapshot = 0
+            self.durable_lsn = snapshot_lsn
+            self.durable.notify_all()
+        return snapshot_lsn
+
+    def write_snapshot(self, snapshot_lsn, balances):
+        path = os.path.join(self.directory, "snapshot.bin")
+        with open(path + ".tmp", "wb") as file:
+            file.write(self.SNAPSHOT_HEADER.pack(snapshot_lsn, len(balances)))
+            parts = []
+            for account_number, balance in balances:
+                account = account_number.encode("utf-8")
+                parts.append(self.SNAPSHOT_ENTRY.pack(balance, len(account)) + account)
+            file.write(b"".join(parts))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+
+        for segment_start, segment_path in self._segments():
+            if segment_start <= snapshot_lsn:
+                os.remove(segment_path)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.appended.notify()
+        if self.flusher is not None:
+            self.flusher.join()
+        self.file.close()
+
+    def recover(self):
+        snapshot_lsn, balances = 0, []
+        path = os.path.join(self.directory, "snapshot.bin")
+        if os.path.exists(path):
+            with open(path, "rb") as file:
+                data = file.read()
+            snapshot_lsn, count = self.SNAPSHOT_HEADER.unpack_from(data, 0)
+            offset = self.SNAPSHOT_HEADER.size
+            for _ in range(count):
+                balance, length = self.SNAPSHOT_ENTRY.unpack_from(data, offset)
+                offset += self.SNAPSHOT_ENTRY.size
+                balances.append((data[offset:offset + length].decode("utf-8"), balance))
+                offset += length
+
+        records = []
+        last_lsn = snapshot_lsn
+        for _, segment_path in self._segments():
+            with open(segment_path, "rb") as file:
+                data = file.read()
+            offset = 0
+            # A torn record at the end of the last segment was never acknowledged and is ignored.
+            while offset + self.RECORD.size <= len(data):
+                lsn, record_type, amount, account_length, other_length = self.RECORD.unpack_from(data, offset)
+                start = offset + self.RECORD.size
+                end = start + account_length + other_length
+                if end > len(data):
+                    break
+                if lsn > last_lsn:
+                    account = data[start:start + account_length].decode("utf-8")
+                    other = data[start + account_length:end].decode("utf-8")
+                    records.append((record_type, account, amount, other))
+                    last_lsn = lsn
+                offset = end
+        return balances, records, last_lsn
+
+    def _segment_path(self, start_lsn):
+        return os.path.join(self.directory, f"wal-{start_lsn:020d}.log")
+
+    def _segments(self):
+        segments = []
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith("wal-") and file_name.endswith(".log"):
+                segments.append((int(file_name[4:-4]), os.path.join(self.directory, file_name)))
+        return sorted(segments)
+
+    # Group commit: whatever accumulated while the previous fsync ran is written and synced together.
+    # sync_lock keeps a snapshot from switching segments between the write and its fsync.
+    def _flush_loop(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.closed:
+                    self.appended.wait()
+                if not self.pending and self.closed:
+                    return
+            with self.sync_lock:
+                with self.lock:
+                    batch = self.pending
+                    self.pending = []
+                    batch_lsn = self.lsn
+                if batch:
+                    self.file.write(b"".join(batch))
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+            with self.lock:
+                self.durable_lsn = max(self.durable_lsn, batch_lsn)
+                self.durable.notify_all()
+
+
 class BankingService:
-    def __init__(self):
-        self.accounts = {}
+    def __init__(self, lock_stripes=256, max_workers=8, journal=None, account_store=None):
+        self.accounts = {} if account_store is None else account_store
+        self.account_locks = [Lock() for _ in range(lock_stripes)]
+        self.max_workers = max_workers
+        self.executor = None
+        self.executor_lock = Lock()
+        self.journal = journal
+        self.snapshot_lock = Lock()
+        if journal is not None:
+            self._recover()
 
     def create_account(self, account_number, init_balance):
-        self.accounts[account_number] = Account(account_number, init_balance)
+        with self.get_account_lock(account_number):
+            self.accounts[account_number] = Account(account_number, init_balance)
+            lsn = self._journal(JournalRecordType.CREATE, account_number, init_balance)
+        self._wait_durable(lsn)
 
     def get_account(self, account_number):
         return self.accounts[account_number]
 
+    def get_total_deposits(self):
+        if isinstance(self.accounts, ColumnarAccountStore):
+            return self.accounts.get_total_balance()
+        return sum(account.get_balance() for account in self.accounts.values())
+
+    def get_accounts_below(self, threshold):
+        if isinstance(self.accounts, ColumnarAccountStore):
+            return self.accounts.get_accounts_below(threshold)
+        return [number for number, account in self.accounts.items() if account.get_balance() < threshold]
+
+    def get_account_lock(self, account_number):
+        return self.account_locks[hash(account_number) % len(self.account_locks)]
+
+    # The account's stripe lock is held for the whole execute(), so the balance check and the debit are atomic.
+    # Stripes are acquired in index order and never twice, so multi-account transactions cannot deadlock.
+    def get_account_locks(self, account_numbers):
+        stripes = sorted({hash(account_number) % len(self.account_locks) for account_number in account_numbers})
+        return [self.account_locks[stripe] for stripe in stripes]
+
+    # Journal records are appended under the same locks, so the log order matches the per-account apply order.
+    # The fsync wait happens after the locks are released so concurrent transactions share one group commit.
     def process_transaction(self, transaction):
-        transaction.execute()
+        locks = self.get_account_locks(transaction.get_account_numbers())
+        for lock in locks:
+            lock.acquire()
+        try:
+            transaction.execute()
+            lsn = self._journal(*transaction.get_journal_record())
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        self._wait_durable(lsn)
+
+    def transfer(self, transaction_id, from_account_number, to_account_number, amount):
+        transaction = TransferTransaction(
+            transaction_id,
+            self.get_account(from_account_number),
+            amount,
+            self.get_account(to_account_number)
+        )
+        self.process_transaction(transaction)
+
+    # Each (transaction_id, from, to, amount) transfer is atomic on its own; returns one exception or None per transfer.
+    # Accounts are looked up inside each task, so an unknown account fails only its own transfer.
+    def bulk_transfer(self, transfers):
+        futures = [self._submit(self.transfer, *transfer) for transfer in transfers]
+        return [future.exception() for future in futures]
+
+    def snapshot(self):
+        with self.snapshot_lock:
+            self.lock_all_accounts()
+            try:
+                snapshot_lsn = self.journal.start_snapshot()
+                balances = [(number, account.get_balance()) for number, account in self.accounts.items()]
+            finally:
+                self.unlock_all_accounts()
+            self.journal.write_snapshot(snapshot_lsn, balances)
+
+    # Stripes are always taken in index order, so whole-book operations cannot deadlock with each other.
+    def lock_all_accounts(self):
+        for lock in self.account_locks:
+            lock.acquire()
+
+    def unlock_all_accounts(self):
+        for lock in reversed(self.account_locks):
+            lock.release()
+
+    # Applies net per-account changes in cents with every account locked, journaling one record per account.
+    def apply_balance_changes(self, changes):
+        lsn = 0
+        self.lock_all_accounts()
+        try:
+            for account_number, cents in changes:
+                if cents >= 0:
+                    self.accounts[account_number].deposit(cents / 100)
+                    lsn = self._journal(JournalRecordType.DEPOSIT, account_number, cents / 100) or lsn
+                else:
+                    self.accounts[account_number].withdraw(-cents / 100)
+                    lsn = self._journal(JournalRecordType.WITHDRAW, account_number, -cents / 100) or lsn
+        finally:
+            self.unlock_all_accounts()
+        self._wait_durable(lsn)
+
+    def close(self):
+        self.shutdown()
+        if self.journal is not None:
+            self.journal.close()
+
+    def _journal(self, record_type, account_number, amount, counterparty=""):
+        if self.journal is None:
+            return 0
+        return self.journal.append(record_type, account_number, amount, counterparty)
+
+    def _wait_durable(self, lsn):
+        if self.journal is None:
+            return
+        self.journal.wait_durable(lsn)
+        if self.journal.needs_snapshot() and not self.snapshot_lock.locked():
+            Thread(target=self.snapshot, daemon=True).start()
+
+    def _recover(self):
+        balances, records, last_lsn = self.journal.recover()
+        for account_number, balance in balances:
+            self.accounts[account_number] = Account(account_number, balance)
+        for record_type, account_number, amount, counterparty in records:
+            self._replay(record_type, account_number, amount, counterparty)
+        self.journal.open(last_lsn)
+
+    def _replay(self, record_type, account_number, amount, counterparty):
+        if record_type == JournalRecordType.CREATE:
+            self.accounts[account_number] = Account(account_number, amount)
+        elif record_type == JournalRecordType.DEPOSIT:
+            self.accounts[account_number].deposit(amount)
+        elif record_type == JournalRecordType.WITHDRAW:
+            self.accounts[account_number].withdraw(amount)
+        elif record_type == JournalRecordType.TRANSFER:
+            self.accounts[account_number].withdraw(amount)
+            self.accounts[counterparty].deposit(amount)
+
+    def submit_transaction(self, transaction) -> Future:
+        return self._submit(self.process_transaction, transaction)
+
+    def _submit(self, fn, *args) -> Future:
+        with self.executor_lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self.executor.submit(fn, *args)
+
+    def process_transactions(self, transactions):
+        futures = [self.submit_transaction(transaction) for transaction in transactions]
+        return [future.exception() for future in futures]
+
+    def shutdown(self):
+        with self.executor_lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
 
 
 class Transaction(ABC):
@@ -64,6 +516,13 @@ class Transaction(ABC):
     def execute(self):
         pass
 
+    @abstractmethod
+    def get_journal_record(self):
+        pass
+
+    def get_account_numbers(self):
+        return [self.account.get_account_number()]
+
 
 class DepositTransaction(Transaction):
     def __init__(self, transaction_id, account, amount):
@@ -72,6 +531,9 @@ class DepositTransaction(Transaction):
     def execute(self):
         self.account.deposit(self.amount)
 
+    def get_journal_record(self):
+        return JournalRecordType.DEPOSIT, self.account.get_account_number(), self.amount
+
 
 class WithdrawTransaction(Transaction):
     def __init__(self, transaction_id, account, amount):
@@ -82,6 +544,34 @@ class WithdrawTransaction(Transaction):
             raise Exception("Insufficient funds in this account")
         self.account.withdraw(self.amount)
 
+    def get_journal_record(self):
+        return JournalRecordType.WITHDRAW, self.account.get_account_number(), self.amount
+
+
+class TransferTransaction(Transaction):
+    def __init__(self, transaction_id, account, amount, target_account):
+        super().__init__(transaction_id, account, amount)
+        self.target_account = target_account
+
+    def execute(self):
+        if self.account.get_account_number() == self.target_account.get_account_number():
+            raise Exception("Cannot transfer to the same account")
+        if self.account.get_balance() < self.amount:
+            raise Exception("Insufficient funds in this account")
+        self.account.withdraw(self.amount)
+        self.target_account.deposit(self.amount)
+
+    def get_journal_record(self):
+        return (
+            JournalRecordType.TRANSFER,
+            self.account.get_account_number(),
+            self.amount,
+            self.target_account.get_account_number()
+        )
+
+    def get_account_numbers(self):
+        return [self.account.get_account_number(), self.target_account.get_account_number()]
+
 
 class CashDispenser:
     def __init__(self, initial_cash):
@@ -95,39 +585,763 @@ class CashDispenser:
             self.cash_available -= amount
             print("Cash dispensed: ", amount)
 
+    def can_dispense(self, amount):
+        return self.cash_available >= amount
+
+
+class DenominationCashDispenser(CashDispenser):
+    def __init__(self, cassettes, rate_window=24 * 3600, clock=time.time):
+        self.cassettes = dict(cassettes)
+        self.cash_available = sum(denomination * count for denomination, count in self.cassettes.items())
+        self.lock = Lock()
+        self.rate_window = rate_window
+        self.clock = clock
+        self.dispense_history = deque()
+        self.window_notes = {denomination: 0 for denomination in self.cassettes}
+        self.plan_cache = {}
+
+    def dispense_cash(self, amount):
+        with self.lock:
+            notes = self._plan(int(amount))
+            if notes is None:
+                raise RuntimeError("Cannot dispense this amount with the notes in the ATM")
+            for denomination, count in notes.items():
+                self.cassettes[denomination] -= count
+            self.cash_available -= amount
+            self._record(notes)
+            print("Cash dispensed: ", amount, notes)
+            return notes
+
+    def can_dispense(self, amount):
+        with self.lock:
+            return self._plan(int(amount)) is not None
+
+    def load_cassette(self, denomination, count):
+        with self.lock:
+            self.cassettes[denomination] = self.cassettes.get(denomination, 0) + count
+            self.window_notes.setdefault(denomination, 0)
+            self.cash_available += denomination * count
+
+    def get_cassettes(self):
+        with self.lock:
+            return dict(self.cassettes)
+
+    # Notes per hour over the trailing window, projected forward from the current cassette counts.
+    def predict_empty_times(self):
+        now = self.clock()
+        with self.lock:
+            self._expire(now)
+            hours = self.rate_window / 3600
+            predictions = {}
+            for denomination, count in self.cassettes.items():
+                rate = self.window_notes[denomination] / hours
+                predictions[denomination] = now + count / rate * 3600 if rate else float("inf")
+            return predictions
+
+    # Bounded change-making: fewest notes first, then the smallest share taken from scarce cassettes.
+    # Plans are memoized on the amount and the current cassette counts.
+    def _plan(self, amount):
+        denominations = sorted(self.cassettes, reverse=True)
+        counts = tuple(self.cassettes[denomination] for denomination in denominations)
+        key = (amount, counts)
+        if key not in self.plan_cache:
+            if len(self.plan_cache) > 10000:
+                self.plan_cache.clear()
+            self.plan_cache[key] = self._solve(amount, denominations, counts)
+        plan = self.plan_cache[key]
+        if plan is None:
+            return None
+        return {denomination: count for denomination, count in zip(denominations, plan) if count}
+
+    @staticmethod
+    def _solve(amount, denominations, counts):
+        memo = {}
+
+        def best(index, remaining):
+            if remaining == 0:
+                return 0, 0.0, (0,) * (len(denominations) - index)
+            if index == len(denominations):
+                return None
+            key = (index, remaining)
+            if key in memo:
+                return memo[key]
+
+            denomination, available = denominations[index], counts[index]
+            result = None
+            for used in range(min(available, remaining // denomination), -1, -1):
+                rest = best(index + 1, remaining - used * denomination)
+                if rest is None:
+                    continue
+                candidate = (rest[0] + used, rest[1] + (used / available if used else 0.0), (used,) + rest[2])
+                if result is None or candidate[:2] < result[:2]:
+                    result = candidate
+            memo[key] = result
+            return result
+
+        solution = best(0, amount)
+        return None if solution is None else solution[2]
+
+    def _record(self, notes):
+        now = self.clock()
+        self.dispense_history.append((now, notes))
+        for denomination, count in notes.items():
+            self.window_notes[denomination] += count
+        self._expire(now)
+
+    def _expire(self, now):
+        while self.dispense_history and self.dispense_history[0][0] < now - self.rate_window:
+            _, notes = self.dispense_history.popleft()
+            for denomination, count in notes.items():
+                self.window_notes[denomination] -= count
+
+
+class SlidingWindowCounter:
+    def __init__(self, window, buckets):
+        self.bucket_width = window / buckets
+        self.counts = [0] * buckets
+        self.amounts = [0.0] * buckets
+        self.total_count = 0
+        self.total_amount = 0.0
+        self.current = None
+
+    # Buckets that fell out of the window are cleared lazily, at most one full ring per call.
+    def advance(self, now):
+        bucket = int(now // self.bucket_width)
+        if self.current is None:
+            self.current = bucket
+            return
+        for step in range(1, min(bucket - self.current, len(self.counts)) + 1):
+            slot = (self.current + step) % len(self.counts)
+            self.total_count -= self.counts[slot]
+            self.total_amount -= self.amounts[slot]
+            self.counts[slot] = 0
+            self.amounts[slot] = 0.0
+        self.current = max(self.current, bucket)
+
+    def add(self, amount):
+        slot = self.current % len(self.counts)
+        self.counts[slot] += 1
+        self.amounts[slot] += amount
+        self.total_count += 1
+        self.total_amount += amount
+
+
+class VelocityLimits:
+    def __init__(self, max_count, max_amount, max_locations=None):
+        self.max_count = max_count
+        self.max_amount = max_amount
+        self.max_locations = max_locations
+
+
+class RiskDecision:
+    def __init__(self, approved, reasons):
+        self.approved = approved
+        self.reasons = reasons
+
+
+class VelocityChecker:
+    def __init__(
+        self,
+        card_limits,
+        atm_limits,
+        window=3600,
+        buckets=12,
+        max_keys=1000000,
+        clock=time.time
+    ):
+        self.card_limits = card_limits
+        self.atm_limits = atm_limits
+        self.window = window
+        self.buckets = buckets
+        self.max_keys = max_keys
+        self.clock = clock
+        # card number -> [SlidingWindowCounter, {location: last seen}]; least recently used first.
+        self.cards = OrderedDict()
+        self.atms = OrderedDict()
+        self.lock = Lock()
+
+    # Approved withdrawals are counted even if the debit later fails, so repeated attempts still trip the limits.
+    def check(self, card_number, atm_id, location, amount):
+        now = self.clock()
+        with self.lock:
+            card_counter, locations = self._get(self.cards, card_number, now)
+            atm_counter, _ = self._get(self.atms, atm_id, now)
+
+            for seen_location in [l for l, seen in locations.items() if seen <= now - self.window]:
+                del locations[seen_location]
+            distinct_locations = len(locations) + (location not in locations)
+
+            reasons = self._exceeded("card", self.card_limits, card_counter, amount, distinct_locations)
+            reasons += self._exceeded("ATM", self.atm_limits, atm_counter, amount, None)
+            if reasons:
+                return RiskDecision(False, reasons)
+
+            card_counter.add(amount)
+            atm_counter.add(amount)
+            locations[location] = now
+            return RiskDecision(True, [])
+
+    def _get(self, entries, key, now):
+        entry = entries.get(key)
+        if entry is None:
+            if len(entries) >= self.max_keys:
+                entries.popitem(last=False)
+            entry = [SlidingWindowCounter(self.window, self.buckets), {}]
+            entries[key] = entry
+        else:
+            entries.move_to_end(key)
+        entry[0].advance(now)
+        return entry
+
+    @staticmethod
+    def _exceeded(scope, limits, counter, amount, distinct_locations):
+        if limits is None:
+            return []
+        reasons = []
+        if counter.total_count + 1 > limits.max_count:
+            reasons.append(f"{scope} withdrawal count limit")
+        if counter.total_amount + amount > limits.max_amount:
+            reasons.append(f"{scope} withdrawal amount limit")
+        if limits.max_locations is not None and distinct_locations is not None and distinct_locations > limits.max_locations:
+            reasons.append(f"{scope} location limit")
+        return reasons
+
+
+class IdempotencyCache:
+    def __init__(self, ttl=24 * 3600, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        # request_id -> [expires_at, request fingerprint, Event set when done, result, exception]
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    # The first call for a request ID runs the operation; concurrent and later retries wait for and
+    # replay its outcome, including a raised exception, until the entry expires.
+    def execute(self, request_id, fingerprint, operation):
+        with self.lock:
+            self._expire(self.clock())
+            entry = self.entries.get(request_id)
+            owner = entry is None
+            if owner:
+                entry = [self.clock() + self.ttl, fingerprint, Event(), None, None]
+                self.entries[request_id] = entry
+        if entry[1] != fingerprint:
+            raise Exception("Request ID was already used for a different request")
+
+        if owner:
+            try:
+                entry[3] = operation()
+            except Exception as e:
+                entry[4] = e
+            finally:
+                entry[2].set()
+        else:
+            entry[2].wait()
+
+        if entry[4] is not None:
+            raise entry[4]
+        return entry[3]
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Every entry has the same TTL, so insertion order is expiry order.
+    def _expire(self, now):
+        while self.entries:
+            request_id, entry = next(iter(self.entries.items()))
+            if entry[0] > now or not entry[2].is_set():
+                return
+            del self.entries[request_id]
+
+
+class TransactionIdGenerator:
+    # Process-wide generator number, so two generators created for the same atm_id in the same
+    # millisecond still get distinct prefixes.
+    instance_counter = itertools.count(1)
+
+    # IDs are the ATM id, creation time in ms, process ID and generator number, followed by a
+    # per-generator counter. next() on itertools.count is atomic, so no lock is needed and IDs from one
+    # generator increase monotonically.
+    def __init__(self, atm_id):
+        instance = next(TransactionIdGenerator.instance_counter)
+        self.prefix = f"TXN{atm_id}{int(time.time() * 1000):013d}{os.getpid():07d}{instance:06d}"
+        self.counter = itertools.count(1)
+
+    def next_id(self):
+        return f"{self.prefix}{next(self.counter):010d}"
+
 
 class ATM:
-    def __init__(self, banking_service, cash_dispenser):
+    def __init__(
+        self,
+        banking_service,
+        cash_dispenser,
+        atm_id="ATM",
+        idempotency_cache=None,
+        velocity_checker=None,
+        location=None
+    ):
         self.banking_service = banking_service
         self.cash_dispenser = cash_dispenser
-        self.transaction_counter = 0
-        self.transaction_lock = Lock()
+        self.atm_id = atm_id
+        self.location = atm_id if location is None else location
+        self.velocity_checker = velocity_checker
+        self.current_card = None
+        self.idempotency_cache = IdempotencyCache() if idempotency_cache is None else idempotency_cache
+        self.transaction_ids = TransactionIdGenerator(atm_id)
 
     def authenticate_user(self, card):
         # Use card and pin to authenticate
-        pass
+        self.current_card = card
 
     def check_balance(self, account_number):
         account = self.banking_service.get_account(account_number)
         return account.get_balance()
     
-    def withdraw_cash(self, account_number, amount):
+    # With a request_id, a retried withdrawal returns the original transaction ID instead of debiting again.
+    def withdraw_cash(self, account_number, amount, request_id=None):
+        if request_id is None:
+            return self._withdraw_cash(account_number, amount)
+        return self.idempotency_cache.execute(
+            request_id,
+            ("WITHDRAW", account_number, amount),
+            lambda: self._withdraw_cash(account_number, amount)
+        )
+
+    def deposit_cash(self, account_number, amount, request_id=None):
+        if request_id is None:
+            return self._deposit_cash(account_number, amount)
+        return self.idempotency_cache.execute(
+            request_id,
+            ("DEPOSIT", account_number, amount),
+            lambda: self._deposit_cash(account_number, amount)
+        )
+
+    def get_transaction_id(self):
+        return self.transaction_ids.next_id()
+
+    # The dispenser is checked before the debit, and the debit is reversed if dispensing still fails.
+    def _withdraw_cash(self, account_number, amount):
+        # With a risk layer configured every withdrawal is checked, card and ATM limits alike; one
+        # without an authenticated card cannot be attributed to a card and is declined.
+        if self.velocity_checker is not None:
+            if self.current_card is None:
+                raise RuntimeError("Withdrawal declined: no authenticated card")
+            decision = self.velocity_checker.check(self.current_card.get_card_number(), self.atm_id, self.location, amount)
+            if not decision.approved:
+                raise RuntimeError("Withdrawal declined: " + ", ".join(decision.reasons))
+        if not self.cash_dispenser.can_dispense(int(amount)):
+            raise RuntimeError("This ATM cannot dispense the requested amount")
         account = self.banking_service.get_account(account_number)
-        transaction = WithdrawTransaction(self.get_transaction_id, account, amount)
+        transaction = WithdrawTransaction(self.get_transaction_id(), account, amount)
         self.banking_service.process_transaction(transaction)
-        self.cash_dispenser.dispense_cash(int(amount))
+        try:
+            self.cash_dispenser.dispense_cash(int(amount))
+        except RuntimeError:
+            self.banking_service.process_transaction(DepositTransaction(self.get_transaction_id(), account, amount))
+            raise
+        return transaction.transaction_id
 
-    def deposit_cash(self, account_number, amount):
+    def _deposit_cash(self, account_number, amount):
         account = self.banking_service.get_account(account_number)
-        transaction = DepositTransaction(self.get_transaction_id, account, amount)
+        transaction = DepositTransaction(self.get_transaction_id(), account, amount)
         self.banking_service.process_transaction(transaction)
+        return transaction.transaction_id
+        
+
+class BankRequestType:
+    BALANCE = 1
+    WITHDRAW = 2
+    DEPOSIT = 3
+
+
+# Frames are a fixed header followed by the UTF-8 account number and transaction ID (requests) or error
+# message (responses). The request ID in every frame lets many requests share one connection in flight.
+BANK_REQUEST = struct.Struct("<IBdHH")
+BANK_RESPONSE = struct.Struct("<IBdH")
+
+
+class BankCoreServer:
+    def __init__(self, banking_service, host="127.0.0.1", port=0, max_in_flight=64):
+        self.banking_service = banking_service
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    # Requests are handled in arrival order; with a journal they run on the default executor instead, so
+    # slow fsyncs are shared by group commit and do not stall the event loop. Every response is drained
+    # and at most max_in_flight executor requests run per connection, so a client that stops reading
+    # stops being read from rather than growing the server's buffers.
+    async def _handle_connection(self, reader, writer):
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        pending = set()
+        try:
+            while True:
+                header = await reader.readexactly(BANK_REQUEST.size)
+                request_id, request_type, amount, account_length, transaction_length = BANK_REQUEST.unpack(header)
+                body = await reader.readexactly(account_length + transaction_length)
+                account_number = body[:account_length].decode()
+                transaction_id = body[account_length:].decode()
+                if self.banking_service.journal is None:
+                    writer.write(self._respond(request_id, request_type, account_number, transaction_id, amount))
+                    await writer.drain()
+                    continue
+                await in_flight.acquire()
+                task = asyncio.ensure_future(self._respond_in_executor(
+                    writer, in_flight, request_id, request_type, account_number, transaction_id, amount
+                ))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if pending:
+                await asyncio.wait(pending)
+            writer.close()
+
+    async def _respond_in_executor(self, writer, in_flight, *request):
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(None, self._respond, *request)
+            writer.write(response)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            in_flight.release()
+
+    def _respond(self, request_id, request_type, account_number, transaction_id, amount):
+        try:
+            account = self.banking_service.get_account(account_number)
+            if request_type == BankRequestType.WITHDRAW:
+                self.banking_service.process_transaction(WithdrawTransaction(transaction_id, account, amount))
+            elif request_type == BankRequestType.DEPOSIT:
+                self.banking_service.process_transaction(DepositTransaction(transaction_id, account, amount))
+            return BANK_RESPONSE.pack(request_id, 0, account.get_balance(), 0)
+        except Exception as e:
+            error = str(e).encode()
+            return BANK_RESPONSE.pack(request_id, 1, 0.0, len(error)) + error
+
+
+class BankConnection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.request_ids = itertools.count(1)
+        self.pending = {}
+        self.reader_task = asyncio.get_running_loop().create_task(self._read_responses())
+
+    @staticmethod
+    async def open(host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return BankConnection(reader, writer)
+
+    # Requests are written without waiting for earlier responses (pipelining); the reader task matches
+    # responses back to their futures by request ID, so they may complete out of order.
+    async def request(self, request_type, account_number, amount=0.0, transaction_id=""):
+        request_id = next(self.request_ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        account = account_number.encode()
+        transaction = transaction_id.encode()
+        self.writer.write(
+            BANK_REQUEST.pack(request_id, request_type, amount, len(account), len(transaction)) + account + transaction
+        )
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self.reader_task
+
+    async def _read_responses(self):
+        error = ConnectionError("Connection to bank core closed")
+        try:
+            while True:
+                header = await self.reader.readexactly(BANK_RESPONSE.size)
+                request_id, status, balance, error_length = BANK_RESPONSE.unpack(header)
+                message = (await self.reader.readexactly(error_length)).decode() if error_length else None
+                future = self.pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if status == 0:
+                    future.set_result(balance)
+                else:
+                    future.set_exception(RuntimeError(message))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = ConnectionError(f"Connection to bank core closed: {e}")
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+
+
+class BankConnectionPool:
+    def __init__(self, host, port, size=4):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.connections = []
+        self.next_connection = itertools.count()
+
+    async def open(self):
+        self.connections = [await BankConnection.open(self.host, self.port) for _ in range(self.size)]
+
+    async def close(self):
+        for connection in self.connections:
+            await connection.close()
+
+    # Each connection multiplexes many ATMs, so requests are spread round-robin rather than checked out.
+    async def request(self, request_type, account_number, amount=0.0, transaction_id=""):
+        connection = self.connections[next(self.next_connection) % len(self.connections)]
+        return await connection.request(request_type, account_number, amount, transaction_id)
+
+
+class NetworkATM:
+    def __init__(self, connection_pool, cash_dispenser, atm_id="ATM"):
+        self.connection_pool = connection_pool
+        self.cash_dispenser = cash_dispenser
+        self.atm_id = atm_id
+        self.transaction_ids = TransactionIdGenerator(atm_id)
 
     def get_transaction_id(self):
-        with self.transaction_lock:
-            self.transaction_counter += 1
-            timestamp = datetime.datetime.now().strftime("%Y%m%D%H%M%S")
-            return f"TXN{timestamp}{self.transaction_counter:010d}"
-        
+        return self.transaction_ids.next_id()
+
+    async def check_balance(self, account_number):
+        return await self.connection_pool.request(BankRequestType.BALANCE, account_number)
+
+    async def withdraw_cash(self, account_number, amount):
+        if not self.cash_dispenser.can_dispense(int(amount)):
+            raise RuntimeError("This ATM cannot dispense the requested amount")
+        transaction_id = self.get_transaction_id()
+        await self.connection_pool.request(BankRequestType.WITHDRAW, account_number, amount, transaction_id)
+        try:
+            self.cash_dispenser.dispense_cash(int(amount))
+        except RuntimeError:
+            await self.connection_pool.request(
+                BankRequestType.DEPOSIT, account_number, amount, self.get_transaction_id()
+            )
+            raise
+        return transaction_id
+
+    async def deposit_cash(self, account_number, amount):
+        transaction_id = self.get_transaction_id()
+        await self.connection_pool.request(BankRequestType.DEPOSIT, account_number, amount, transaction_id)
+        return transaction_id
+
+
+class NetworkLoadReport:
+    def __init__(self, atms, transactions, failures, elapsed, latencies):
+        self.atms = atms
+        self.transactions = transactions
+        self.failures = failures
+        self.elapsed = elapsed
+        self.latencies = sorted(latencies)
+
+    def get_throughput(self):
+        return self.transactions / self.elapsed
+
+    def get_percentile(self, percentile):
+        if not self.latencies:
+            return 0.0
+        return self.latencies[min(len(self.latencies) - 1, int(len(self.latencies) * percentile / 100))]
+
+    def __str__(self):
+        return (f"ATMs={self.atms} transactions={self.transactions} failures={self.failures} "
+                f"tps={self.get_throughput():.0f} p50={self.get_percentile(50) * 1000:.2f}ms "
+                f"p95={self.get_percentile(95) * 1000:.2f}ms p99={self.get_percentile(99) * 1000:.2f}ms")
+
+
+class ATMNetworkSimulator:
+    def __init__(self, host, port, account_numbers, atms=1000, pool_size=4, think_time=0.0, seed=0):
+        self.host = host
+        self.port = port
+        self.account_numbers = account_numbers
+        self.atms = atms
+        self.pool_size = pool_size
+        self.think_time = think_time
+        self.random = random.Random(seed)
+
+    # Every simulated ATM withdraws in a loop until the deadline; latency is measured end to end,
+    # from the dispenser check through the bank round trip to the cash leaving the ATM.
+    async def run(self, duration):
+        pool = BankConnectionPool(self.host, self.port, self.pool_size)
+        await pool.open()
+        latencies = []
+        failures = [0]
+        deadline = time.perf_counter() + duration
+
+        async def run_atm(atm):
+            rng = random.Random(self.random.random())
+            while time.perf_counter() < deadline:
+                account_number = rng.choice(self.account_numbers)
+                start = time.perf_counter()
+                try:
+                    await atm.withdraw_cash(account_number, 20.0)
+                    latencies.append(time.perf_counter() - start)
+                except RuntimeError:
+                    failures[0] += 1
+                if self.think_time:
+                    await asyncio.sleep(rng.expovariate(1 / self.think_time))
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(
+                run_atm(NetworkATM(pool, CashDispenser(10 ** 9), atm_id=f"ATM{n}")) for n in range(self.atms)
+            ))
+        finally:
+            elapsed = time.perf_counter() - start
+            await pool.close()
+        return NetworkLoadReport(self.atms, len(latencies), failures[0], elapsed, latencies)
+
+
+class SettlementRecordType:
+    DEPOSIT = 1
+    WITHDRAW = 2
+
+
+class SettlementException:
+    UNKNOWN_ACCOUNT = "UNKNOWN_ACCOUNT"
+    OVERDRAWN_ACCOUNT = "OVERDRAWN_ACCOUNT"
+    DISPENSE_MISMATCH = "DISPENSE_MISMATCH"
+    ATM_IMBALANCE = "ATM_IMBALANCE"
+    CASH_POSITION_MISMATCH = "CASH_POSITION_MISMATCH"
+
+    def __init__(self, kind, key, detail):
+        self.kind = kind
+        self.key = key
+        self.detail = detail
+
+    def __str__(self):
+        return f"{self.kind} {self.key}: {self.detail}"
+
+
+class SettlementReport:
+    def __init__(self):
+        self.records = 0
+        self.applied_records = 0
+        self.accounts_settled = 0
+        self.atm_totals = {}
+        self.exceptions = []
+        self.elapsed = 0.0
+
+    def get_exceptions(self, kind=None):
+        return [exception for exception in self.exceptions if kind is None or exception.kind == kind]
+
+    def __str__(self):
+        kinds = {}
+        for exception in self.exceptions:
+            kinds[exception.kind] = kinds.get(exception.kind, 0) + 1
+        return (f"Settled {self.applied_records}/{self.records} records across {self.accounts_settled} accounts "
+                f"and {len(self.atm_totals)} ATMs in {self.elapsed:.2f}s, exceptions: {kinds}")
+
+
+class SettlementEngine:
+    def __init__(self, banking_service, max_record_exceptions=1000):
+        self.banking_service = banking_service
+        self.max_record_exceptions = max_record_exceptions
+
+    # Records are (transaction_id, atm_id, account_number, record_type, amount, dispensed). They are
+    # dictionary-encoded into integer columns once, then every total is a grouped sum over those columns.
+    # cash_positions maps atm_id to (opening cash, CashDispenser) to check the dispenser's closing cash.
+    def settle(self, records, cash_positions=None):
+        started = time.perf_counter()
+        report = SettlementReport()
+
+        account_codes, account_numbers = {}, []
+        atm_codes, atm_ids = {}, []
+        accounts, atms = array("q"), array("q")
+        debits, credits, dispensed = array("q"), array("q"), array("q")
+
+        for transaction_id, atm_id, account_number, record_type, amount, cash_out in records:
+            report.records += 1
+            if account_number not in account_codes:
+                if account_number not in self.banking_service.accounts:
+                    self._add_record_exception(report, SettlementException(
+                        SettlementException.UNKNOWN_ACCOUNT, transaction_id, f"account {account_number}"
+                    ))
+                    continue
+                account_codes[account_number] = len(account_numbers)
+                account_numbers.append(account_number)
+            if atm_id not in atm_codes:
+                atm_codes[atm_id] = len(atm_ids)
+                atm_ids.append(atm_id)
+
+            amount = to_cents(amount)
+            cash_out = to_cents(cash_out)
+            is_withdrawal = record_type == SettlementRecordType.WITHDRAW
+            accounts.append(account_codes[account_number])
+            atms.append(atm_codes[atm_id])
+            debits.append(amount if is_withdrawal else 0)
+            credits.append(0 if is_withdrawal else amount)
+            dispensed.append(cash_out)
+            if is_withdrawal and cash_out != amount:
+                self._add_record_exception(report, SettlementException(
+                    SettlementException.DISPENSE_MISMATCH, transaction_id, f"debited {amount} dispensed {cash_out} cents"
+                ))
+        report.applied_records = len(accounts)
+
+        net = [credit - debit for credit, debit in zip(
+            self._group_sum(accounts, credits, len(account_numbers)),
+            self._group_sum(accounts, debits, len(account_numbers))
+        )]
+        changes = [(account_numbers[code], cents) for code, cents in enumerate(net) if cents]
+        self.banking_service.apply_balance_changes(changes)
+        report.accounts_settled = len(changes)
+
+        for account_number, _ in changes:
+            balance = self.banking_service.get_account(account_number).get_balance()
+            if balance < 0:
+                report.exceptions.append(SettlementException(
+                    SettlementException.OVERDRAWN_ACCOUNT, account_number, f"balance {balance:.2f}"
+                ))
+
+        atm_debits = self._group_sum(atms, debits, len(atm_ids))
+        atm_dispensed = self._group_sum(atms, dispensed, len(atm_ids))
+        for code, atm_id in enumerate(atm_ids):
+            report.atm_totals[atm_id] = (atm_debits[code] / 100, atm_dispensed[code] / 100)
+            if atm_debits[code] != atm_dispensed[code]:
+                report.exceptions.append(SettlementException(
+                    SettlementException.ATM_IMBALANCE, atm_id,
+                    f"debited {atm_debits[code] / 100:.2f} dispensed {atm_dispensed[code] / 100:.2f}"
+                ))
+
+        for atm_id, (opening_cash, cash_dispenser) in (cash_positions or {}).items():
+            expected = to_cents(opening_cash) - (atm_dispensed[atm_codes[atm_id]] if atm_id in atm_codes else 0)
+            if expected != to_cents(cash_dispenser.cash_available):
+                report.exceptions.append(SettlementException(
+                    SettlementException.CASH_POSITION_MISMATCH, atm_id,
+                    f"expected {expected / 100:.2f} in cassettes, found {cash_dispenser.cash_available:.2f}"
+                ))
+
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _add_record_exception(self, report, exception):
+        if len(report.exceptions) < self.max_record_exceptions:
+            report.exceptions.append(exception)
+
+    @staticmethod
+    def _group_sum(keys, values, size):
+        if numpy is not None:
+            sums = numpy.zeros(size, dtype=numpy.int64)
+            numpy.add.at(sums, numpy.frombuffer(keys, dtype=numpy.int64), numpy.frombuffer(values, dtype=numpy.int64))
+            return sums.tolist()
+        sums = [0] * size
+        for key, value in zip(keys, values):
+            sums[key] += value
+        return sums
+
 
 class ATMDemo:
     @staticmethod
@@ -162,5 +1376,284 @@ class ATMDemo:
         balance_2 = atm.check_balance(account_number_2)
         print("Account Number 2 Balance After Withdraw: ", balance_2)
 
+        note_dispenser = DenominationCashDispenser({20: 40, 50: 4, 100: 10})
+        note_atm = ATM(banking_service, note_dispenser)
+        note_atm.withdraw_cash(account_number_1, 260.0)
+        note_atm.withdraw_cash(account_number_2, 60.0)
+        first = note_atm.withdraw_cash(account_number_2, 40.0, request_id="client-req-1")
+        retry = note_atm.withdraw_cash(account_number_2, 40.0, request_id="client-req-1")
+        print("Retried withdrawal returned original transaction: ", first == retry, first)
+        print("Account Number 2 Balance After Retry: ", atm.check_balance(account_number_2))
+        print("Cassettes: ", note_dispenser.get_cassettes())
+        print("Cassettes empty at: ", {
+            denomination: datetime.datetime.fromtimestamp(at).strftime("%a %H:%M") if at != float("inf") else "never"
+            for denomination, at in note_dispenser.predict_empty_times().items()
+        })
+
+        velocity_checker = VelocityChecker(VelocityLimits(max_count=2, max_amount=500), None)
+        guarded_atm = ATM(banking_service, CashDispenser(10000), atm_id="ATM-2", velocity_checker=velocity_checker)
+        guarded_atm.authenticate_user(card1)
+        guarded_atm.withdraw_cash(account_number_1, 10.0)
+        guarded_atm.withdraw_cash(account_number_1, 10.0)
+        try:
+            guarded_atm.withdraw_cash(account_number_1, 10.0)
+        except RuntimeError as e:
+            print(e)
+
+
+class ATMBenchmark:
+
+    @staticmethod
+    def run():
+        ATMBenchmark.run_stress_test(threads=8, accounts=10, operations=20000)
+        for threads in (1, 2, 4, 8):
+            ATMBenchmark.run_throughput(threads, accounts=10000, operations=200000)
+        for threads in (1, 8, 32):
+            ATMBenchmark.run_journaled_throughput(threads, operations=20000)
+        ATMBenchmark.run_recovery(accounts=1000000, tail=200000)
+        ATMBenchmark.run_account_store_memory(accounts=1000000)
+        ATMBenchmark.run_settlement(accounts=100000, atms=500, records=1000000)
+        for threads in (1, 4, 16):
+            ATMBenchmark.run_transfers(threads, accounts=8, transfers=100000)
+        ATMBenchmark.run_velocity_checks(cards=100000, atms=2000, checks=500000)
+        for atms in (100, 1000, 5000):
+            ATMBenchmark.run_network(atms, accounts=10000, duration=5.0)
+
+    # Hot accounts, many threads: every successful deposit and withdrawal must be reflected in the balance.
+    @staticmethod
+    def run_stress_test(threads: int, accounts: int, operations: int):
+        banking_service = BankingService()
+        for i in range(accounts):
+            banking_service.create_account(f"ACC{i}", 1000)
+
+        results = [[0, 0] for _ in range(threads)]
+
+        def worker(index: int):
+            for n in range(operations // threads):
+                account = banking_service.get_account(f"ACC{n % accounts}")
+                try:
+                    if n % 2:
+                        banking_service.process_transaction(WithdrawTransaction(n, account, 7))
+                        results[index][1] += 7
+                    else:
+                        banking_service.process_transaction(DepositTransaction(n, account, 5))
+                        results[index][0] += 5
+                except Exception:
+                    pass
+
+        workers = [Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        deposited = sum(result[0] for result in results)
+        withdrawn = sum(result[1] for result in results)
+        expected = accounts * 1000 + deposited - withdrawn
+        actual = sum(account.get_balance() for account in banking_service.accounts.values())
+        overdrawn = sum(1 for account in banking_service.accounts.values() if account.get_balance() < 0)
+        print(f"Stress test: expected={expected} actual={actual} lost_updates={expected != actual} overdrawn={overdrawn}")
+
+    @staticmethod
+    def run_throughput(threads: int, accounts: int, operations: int):
+        banking_service = BankingService(max_workers=threads)
+        for i in range(accounts):
+            banking_service.create_account(f"ACC{i}", 1000000)
+
+        transactions = [
+            WithdrawTransaction(n, banking_service.get_account(f"ACC{n % accounts}"), 1)
+            for n in range(operations)
+        ]
+        start = time.perf_counter()
+        chunk = operations // threads
+        workers = [
+            Thread(target=lambda part: [banking_service.process_transaction(t) for t in part],
+                   args=(transactions[i * chunk:(i + 1) * chunk],))
+            for i in range(threads)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print(f"{threads} threads: {chunk * threads / elapsed:.0f} transactions/sec")
+
+
+    @staticmethod
+    def run_journaled_throughput(threads: int, operations: int):
+        directory = tempfile.mkdtemp()
+        banking_service = BankingService(journal=TransactionJournal(directory))
+        for i in range(100):
+            banking_service.create_account(f"ACC{i}", 1000000)
+
+        def worker(index: int):
+            for n in range(operations // threads):
+                account = banking_service.get_account(f"ACC{(index + n) % 100}")
+                banking_service.process_transaction(DepositTransaction(n, account, 1))
+
+        start = time.perf_counter()
+        workers = [Thread(target=worker, args=(i,)) for i in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        banking_service.close()
+        shutil.rmtree(directory)
+        print(f"Journaled, {threads} threads: {operations // threads * threads / elapsed:.0f} transactions/sec")
+
+    @staticmethod
+    def run_recovery(accounts: int, tail: int):
+        directory = tempfile.mkdtemp()
+        journal = TransactionJournal(directory)
+        banking_service = BankingService(journal=journal)
+        for i in range(accounts):
+            banking_service.accounts[f"ACC{i:08d}"] = Account(f"ACC{i:08d}", 1000.0)
+        banking_service.snapshot()
+        for n in range(tail):
+            lsn = journal.append(JournalRecordType.DEPOSIT, f"ACC{n % accounts:08d}", 1.0)
+        journal.wait_durable(lsn)
+        banking_service.close()
+
+        start = time.perf_counter()
+        recovered = BankingService(journal=TransactionJournal(directory))
+        elapsed = time.perf_counter() - start
+        total = sum(account.get_balance() for account in recovered.accounts.values())
+        recovered.close()
+        shutil.rmtree(directory)
+        print(f"Recovered {accounts} accounts + {tail} log records in {elapsed:.2f}s (total balance {total:.0f})")
+
+
+    @staticmethod
+    def run_account_store_memory(accounts: int):
+        numbers = [f"ACC{i:08d}" for i in range(accounts)]
+        for name, account_store in (("dict of Account", None), ("ColumnarAccountStore", ColumnarAccountStore())):
+            tracemalloc.start()
+            banking_service = BankingService(account_store=account_store)
+            if account_store is None:
+                for number in numbers:
+                    banking_service.accounts[number] = Account(number, 1000.0)
+            else:
+                account_store.add_many(numbers, [1000.0] * accounts)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            total = banking_service.get_total_deposits()
+            below = len(banking_service.get_accounts_below(500.0))
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{name}: {memory / accounts:.0f} bytes/account, total={total:.0f} below={below} in {elapsed:.1f}ms")
+
+
+    @staticmethod
+    def run_settlement(accounts: int, atms: int, records: int):
+        account_store = ColumnarAccountStore()
+        account_store.add_many([f"ACC{i:08d}" for i in range(accounts)], [500.0] * accounts)
+        banking_service = BankingService(account_store=account_store)
+
+        cash_positions = {f"ATM{i:04d}": [100000.0, CashDispenser(100000.0)] for i in range(atms)}
+        day = []
+        for n in range(records):
+            atm_id = f"ATM{n % atms:04d}"
+            amount = 20.0 * (1 + n % 5)
+            if n % 3:
+                cash_out = amount if n != 12346 else amount - 20.0
+                day.append((n, atm_id, f"ACC{n * 7919 % accounts:08d}", SettlementRecordType.WITHDRAW, amount, cash_out))
+                cash_positions[atm_id][1].cash_available -= cash_out
+            else:
+                day.append((n, atm_id, f"ACC{n * 7919 % accounts:08d}", SettlementRecordType.DEPOSIT, amount, 0.0))
+        day.append((records, "ATM0000", "NOSUCHACCOUNT", SettlementRecordType.WITHDRAW, 20.0, 20.0))
+
+        report = SettlementEngine(banking_service).settle(day, {atm_id: tuple(position) for atm_id, position in cash_positions.items()})
+        print(report)
+        for exception in report.exceptions[:5]:
+            print(f"  {exception}")
+
+
+    # Hot-account transfers while an auditor repeatedly locks the whole book and checks the total never moves.
+    @staticmethod
+    def run_transfers(threads: int, accounts: int, transfers: int):
+        banking_service = BankingService(max_workers=threads)
+        for i in range(accounts):
+            banking_service.create_account(f"ACC{i}", 1000)
+        expected_total = accounts * 1000
+        audit = {"checks": 0, "violations": 0, "running": True}
+
+        def auditor():
+            while audit["running"]:
+                banking_service.lock_all_accounts()
+                try:
+                    total = sum(account.get_balance() for account in banking_service.accounts.values())
+                finally:
+                    banking_service.unlock_all_accounts()
+                audit["checks"] += 1
+                audit["violations"] += total != expected_total
+                time.sleep(0.001)
+
+        auditor_thread = Thread(target=auditor)
+        auditor_thread.start()
+        batch = [
+            (f"TRF{n}", f"ACC{n % accounts}", f"ACC{(n * 7 + 3) % accounts}", 1 + n % 50)
+            for n in range(transfers)
+        ]
+        start = time.perf_counter()
+        results = banking_service.bulk_transfer(batch)
+        elapsed = time.perf_counter() - start
+        audit["running"] = False
+        auditor_thread.join()
+        banking_service.shutdown()
+
+        total = sum(account.get_balance() for account in banking_service.accounts.values())
+        failed = sum(1 for result in results if result is not None)
+        print(f"Transfers, {threads} threads: {transfers / elapsed:.0f}/sec, failed={failed}, "
+              f"audits={audit['checks']}, violations={audit['violations'] + (total != expected_total)}")
+
+
+    @staticmethod
+    def run_velocity_checks(cards: int, atms: int, checks: int):
+        simulated_time = [time.time()]
+        velocity_checker = VelocityChecker(
+            VelocityLimits(max_count=5, max_amount=1000, max_locations=2),
+            VelocityLimits(max_count=500, max_amount=100000),
+            clock=lambda: simulated_time[0]
+        )
+        requests = [(f"CARD{n * 7919 % cards}", f"ATM{(n + n // cards) % atms}", 20 * (1 + n % 10)) for n in range(checks)]
+
+        declined = 0
+        start = time.perf_counter()
+        for card_number, atm_id, amount in requests:
+            # 50k withdrawals per simulated second.
+            simulated_time[0] += 0.00002
+            declined += not velocity_checker.check(card_number, atm_id, atm_id, amount).approved
+        elapsed = time.perf_counter() - start
+        print(f"Velocity checks: {checks / elapsed:.0f}/sec, declined={declined}, "
+              f"mean={elapsed / checks * 1e6:.1f}us, tracked cards={len(velocity_checker.cards)}")
+
+
+    @staticmethod
+    def run_network(atms: int, accounts: int, duration: float):
+        banking_service = BankingService()
+        account_numbers = [f"ACC{n:08d}" for n in range(accounts)]
+        for account_number in account_numbers:
+            banking_service.create_account(account_number, 10 ** 9)
+
+        async def simulate():
+            server = BankCoreServer(banking_service)
+            port = await server.start()
+            try:
+                return await ATMNetworkSimulator("127.0.0.1", port, account_numbers, atms=atms).run(duration)
+            finally:
+                await server.close()
+
+        # CashDispenser prints every note it dispenses; keep that out of the measurement.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report = asyncio.run(simulate())
+        print(f"Network: {report}")
+        banking_service.close()
+
+
 if __name__ == "__main__":
-    ATMDemo.run()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        ATMBenchmark.run()
+    else:
+        ATMDemo.run()
\ No newline at end of file
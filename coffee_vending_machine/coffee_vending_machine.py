@@ -6,6 +6,14 @@
 # 6. The machine should track the inventory of ingredients and notify when they are running low.
 # 7. The machine should handle multiple user requests concurrently and ensure thread safety.
 
+from __future__ import annotations
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+from threading import Lock
+import time
+
 class Coffee:
     def __init__(self, name: str, price: float, recipe: object):
         self.name = name
@@ -48,15 +56,31 @@ class Payment:
 class CoffeeMachine:
     _instance = None
 
-    def __init__(self):
-        if CoffeeMachine._instance is not None:
-            raise Exception("This class is a singleton!")
-        else:
+    # An unnamed machine is the process-wide singleton; fleets create named machines with their own stock and menu.
+    def __init__(self, machine_id: str = None, ingredient_quantities: dict = None, menu: dict = None):
+        if machine_id is None:
+            if CoffeeMachine._instance is not None:
+                raise Exception("This class is a singleton!")
             CoffeeMachine._instance = self
-            self.coffee_menu = []
-            self.ingredients = {}
+
+        self.machine_id = machine_id or "default"
+        self.coffee_menu = []
+        self.ingredients = {}
+        self.inventory_lock = Lock()
+        self.sale_listeners = []
+        self.restock_listeners = []
+        self.low_inventory_threshold = 3
+        self.ledger = SalesLedger(self.machine_id)
+        if ingredient_quantities is None:
             self._initialize_ingredients()
+        else:
+            for name, quantity in ingredient_quantities.items():
+                self.ingredients[name] = Ingredient(name, quantity)
+        if menu is None:
             self._initialize_coffee_menu()
+        else:
+            for name, (price, recipe) in menu.items():
+                self.add_coffee(name, price, recipe)
 
     @staticmethod
     def get_instance():
@@ -91,6 +115,33 @@ class CoffeeMachine:
         self.coffee_menu.append(Coffee("Cappuccino", 3.5, cappuccino_recipe))
         self.coffee_menu.append(Coffee("Latte", 4.0, latte_recipe))
 
+    def add_coffee(self, name: str, price: float, recipe: dict):
+        self.coffee_menu.append(Coffee(name, price, {
+            self.ingredients[ingredient_name]: quantity for ingredient_name, quantity in recipe.items()
+        }))
+
+    def get_machine_id(self):
+        return self.machine_id
+
+    def add_sale_listener(self, listener):
+        self.sale_listeners.append(listener)
+
+    def add_restock_listener(self, listener):
+        self.restock_listeners.append(listener)
+
+    # Removal rebinds the list instead of mutating it, so a notification already iterating is unaffected.
+    def remove_sale_listener(self, listener):
+        self.sale_listeners = [l for l in self.sale_listeners if l != listener]
+
+    def remove_restock_listener(self, listener):
+        self.restock_listeners = [l for l in self.restock_listeners if l != listener]
+
+    def restock(self, ingredient_name: str, amount: int):
+        with self.inventory_lock:
+            self.ingredients[ingredient_name].update_quantity(amount)
+        for listener in self.restock_listeners:
+            listener(self, ingredient_name, amount)
+
     def display_menu(self):
         print("Coffee Menu:")
         for coffee in self.coffee_menu:
@@ -104,10 +155,9 @@ class CoffeeMachine:
             
         return None
     
-    def dispense_coffee(self, coffee: Coffee, payment: Payment):
+    def dispense_coffee(self, coffee: Coffee, payment: Payment) -> bool:
         if payment.get_amount() >= coffee.get_price():
-            if self._has_enough_ingredients(coffee):
-                self._update_ingredients(coffee)
+            if self.reserve_ingredients(coffee):
                 print(f"Dispensing {coffee.get_name()}...")
                 
                 change = payment.get_amount() - coffee.get_price()
@@ -115,11 +165,28 @@ class CoffeeMachine:
                     print(f"Please collect your change: ${change}")
                 
                 print(f"Please collect your {coffee.get_name()}")
+                self.ledger.record(SalesEventType.SALE, coffee, payment.get_amount())
+                return True
             else:
                 print(f"Insufficient ingredients to make {coffee.get_name()}")
+                self.ledger.record(SalesEventType.INSUFFICIENT_INGREDIENTS, coffee, payment.get_amount())
         else:
             print(f"Insufficient payment for {coffee.get_name()}")
-            
+            self.ledger.record(SalesEventType.INSUFFICIENT_PAYMENT, coffee, payment.get_amount())
+        return False
+
+    def get_ledger(self):
+        return self.ledger
+
+    # Check and debit happen under one lock, so concurrent orders can never oversell an ingredient.
+    def reserve_ingredients(self, coffee: Coffee) -> bool:
+        with self.inventory_lock:
+            if not self._has_enough_ingredients(coffee):
+                return False
+            self._update_ingredients(coffee)
+        for listener in self.sale_listeners:
+            listener(self, coffee)
+        return True
 
     def _has_enough_ingredients(self, coffee: Coffee):
         for ingredient, required_quantity in coffee.get_recipe().items():
@@ -131,10 +198,673 @@ class CoffeeMachine:
     def _update_ingredients(self, coffee: Coffee):
         for ingredient, required_quantity in coffee.get_recipe().items():
             ingredient.update_quantity(-required_quantity)
-            if ingredient.get_quantity() < 3:
+            if ingredient.get_quantity() < self.low_inventory_threshold:
                 print(f"Low inventory alert: {ingredient.get_name()}")
 
 
+class SalesEventType(Enum):
+    SALE = 1
+    INSUFFICIENT_PAYMENT = 2
+    INSUFFICIENT_INGREDIENTS = 3
+
+
+class SalesLedger:
+    def __init__(self, machine_id: str):
+        self.machine_id = machine_id
+        self.lock = Lock()
+        # Append-only event columns; coffees are dictionary-encoded and money is kept in cents.
+        self.coffee_names = []
+        self.coffee_codes = {}
+        self.timestamps = array("d")
+        self.event_types = array("B")
+        self.coffees = array("H")
+        self.prices = array("q")
+        self.changes = array("q")
+        # Hourly rollups: hour -> [revenue cents, change cents, sales, failed payment, failed ingredients],
+        # plus hour -> {coffee code: cups}. Hours are kept sorted, so ranges can be bisected.
+        self.hours = []
+        self.hourly = {}
+        self.hourly_mix = {}
+        self.totals = [0, 0, 0, 0, 0]
+        self.mix = {}
+
+    def record(self, event_type: SalesEventType, coffee: Coffee, paid: float, timestamp: float = None):
+        timestamp = time.time() if timestamp is None else timestamp
+        price = round(coffee.get_price() * 100)
+        change = round(paid * 100) - price if event_type == SalesEventType.SALE else round(paid * 100)
+
+        with self.lock:
+            code = self.coffee_codes.get(coffee.get_name())
+            if code is None:
+                code = len(self.coffee_names)
+                self.coffee_codes[coffee.get_name()] = code
+                self.coffee_names.append(coffee.get_name())
+
+            # Late events keep their real timestamp and are inserted in time order (an O(n) shift, but
+            # they are rare), so range queries and hourly rollups stay exact.
+            if not self.timestamps or timestamp >= self.timestamps[-1]:
+                self.timestamps.append(timestamp)
+                self.event_types.append(event_type.value)
+                self.coffees.append(code)
+                self.prices.append(price)
+                self.changes.append(change)
+            else:
+                position = bisect_right(self.timestamps, timestamp)
+                self.timestamps.insert(position, timestamp)
+                self.event_types.insert(position, event_type.value)
+                self.coffees.insert(position, code)
+                self.prices.insert(position, price)
+                self.changes.insert(position, change)
+
+            hour = int(timestamp // 3600)
+            if hour not in self.hourly:
+                insort(self.hours, hour)
+                self.hourly[hour] = [0, 0, 0, 0, 0]
+                self.hourly_mix[hour] = {}
+            for rollup, mix in ((self.hourly[hour], self.hourly_mix[hour]), (self.totals, self.mix)):
+                self._apply(rollup, mix, event_type.value, code, price, change)
+
+    def get_event_count(self):
+        return len(self.timestamps)
+
+    def get_revenue(self, start: float = None, end: float = None) -> float:
+        return self._aggregate(start, end)[0][0] / 100
+
+    def get_change_given(self, start: float = None, end: float = None) -> float:
+        return self._aggregate(start, end)[0][1] / 100
+
+    def get_summary(self, start: float = None, end: float = None) -> dict:
+        rollup, mix = self._aggregate(start, end)
+        return {
+            "revenue": rollup[0] / 100,
+            "change_given": rollup[1] / 100,
+            "sales": rollup[2],
+            "failed_payment": rollup[3],
+            "failed_ingredients": rollup[4],
+            "mix": {self.coffee_names[code]: cups for code, cups in mix.items()}
+        }
+
+    def get_mix(self, start: float = None, end: float = None) -> dict:
+        return self.get_summary(start, end)["mix"]
+
+    def get_revenue_by_hour(self, start: float = None, end: float = None) -> dict:
+        with self.lock:
+            first, last = self._hour_range(start, end)
+            return {self.hours[i] * 3600: self.hourly[self.hours[i]][0] / 100 for i in range(first, last)}
+
+    @staticmethod
+    def _apply(rollup: list, mix: dict, event_type: int, code: int, price: int, change: int):
+        if event_type == SalesEventType.SALE.value:
+            rollup[0] += price
+            rollup[1] += change
+            rollup[2] += 1
+            mix[code] = mix.get(code, 0) + 1
+        elif event_type == SalesEventType.INSUFFICIENT_PAYMENT.value:
+            rollup[3] += 1
+        else:
+            rollup[4] += 1
+
+    def _hour_range(self, start: float, end: float):
+        first = 0 if start is None else bisect_left(self.hours, -(-start // 3600))
+        last = len(self.hours) if end is None else bisect_left(self.hours, end // 3600)
+        return first, max(first, last)
+
+    # Whole hours inside [start, end) come from the hourly rollups; only the ragged edges touch raw events.
+    def _aggregate(self, start: float, end: float):
+        with self.lock:
+            if start is None and end is None:
+                return list(self.totals), dict(self.mix)
+
+            rollup, mix = [0, 0, 0, 0, 0], {}
+            first, last = self._hour_range(start, end)
+            for i in range(first, last):
+                hour = self.hours[i]
+                rollup = [total + value for total, value in zip(rollup, self.hourly[hour])]
+                for code, cups in self.hourly_mix[hour].items():
+                    mix[code] = mix.get(code, 0) + cups
+
+            if first < last:
+                edges = [(start, self.hours[first] * 3600), ((self.hours[last - 1] + 1) * 3600, end)]
+            else:
+                edges = [(start, end)]
+            for edge_start, edge_end in edges:
+                low = 0 if edge_start is None else bisect_left(self.timestamps, edge_start)
+                high = len(self.timestamps) if edge_end is None else bisect_left(self.timestamps, edge_end)
+                for i in range(low, high):
+                    self._apply(rollup, mix, self.event_types[i], self.coffees[i], self.prices[i], self.changes[i])
+            return rollup, mix
+
+
+class OrderStatus(Enum):
+    QUEUED = 1
+    BREWING = 2
+    SERVED = 3
+    INSUFFICIENT_PAYMENT = 4
+    INSUFFICIENT_INGREDIENTS = 5
+
+
+class Order:
+    def __init__(self, order_id: int, coffee: Coffee, payment: Payment):
+        self.order_id = order_id
+        self.coffee = coffee
+        self.payment = payment
+        self.status = OrderStatus.QUEUED
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.completed_at = None
+
+    def get_status(self):
+        return self.status
+
+    def get_change(self):
+        if self.status != OrderStatus.SERVED:
+            return self.payment.get_amount()
+        return self.payment.get_amount() - self.coffee.get_price()
+
+    def get_queue_wait(self):
+        return self.started_at - self.queued_at
+
+
+class BatchObjective(Enum):
+    REVENUE = 1
+    ORDERS_SERVED = 2
+
+
+class BatchPlan:
+    def __init__(self, selected_orders: list, rejected_orders: list, value: float, exact: bool, planning_time: float):
+        self.selected_orders = selected_orders
+        self.rejected_orders = rejected_orders
+        self.value = value
+        self.exact = exact
+        self.planning_time = planning_time
+
+    def get_selected_orders(self):
+        return self.selected_orders
+
+    def get_rejected_orders(self):
+        return self.rejected_orders
+
+
+class OrderBatchPlanner:
+    def __init__(self, coffee_machine: CoffeeMachine, objective: BatchObjective = BatchObjective.REVENUE, time_budget: float = 0.05):
+        self.coffee_machine = coffee_machine
+        self.objective = objective
+        self.time_budget = time_budget
+
+    # Orders for the same coffee are interchangeable, so the knapsack is solved over how many of each
+    # coffee to serve (a bounded multi-dimensional knapsack, memoized on remaining stock). If that does
+    # not finish inside the time budget, a scarcity-weighted greedy plan is used instead.
+    def plan(self, orders: list) -> BatchPlan:
+        started = time.monotonic()
+        payable = [order for order in orders if order.payment.get_amount() >= order.coffee.get_price()]
+
+        with self.coffee_machine.inventory_lock:
+            stock = {name: ingredient.get_quantity() for name, ingredient in self.coffee_machine.ingredients.items()}
+        names = sorted(stock)
+
+        groups = {}
+        for order in payable:
+            groups.setdefault(order.coffee.get_name(), []).append(order)
+        coffees = [(
+            group[0].coffee,
+            tuple(self._recipe(group[0].coffee).get(name, 0) for name in names),
+            self._value(group[0].coffee),
+            len(group)
+        ) for group in groups.values()]
+
+        try:
+            counts = self._solve_exact(coffees, tuple(stock[name] for name in names), started + self.time_budget)
+            exact = True
+        except TimeoutError:
+            counts = self._solve_greedy(coffees, [stock[name] for name in names])
+            exact = False
+
+        selected_ids = set()
+        for (coffee, _, _, _), count in zip(coffees, counts):
+            selected_ids.update(order.order_id for order in groups[coffee.get_name()][:count])
+
+        # Chosen orders keep their arrival order; everything else is rejected.
+        selected = [order for order in orders if order.order_id in selected_ids]
+        rejected = [order for order in orders if order.order_id not in selected_ids]
+        value = sum(self._value(order.coffee) for order in selected)
+        return BatchPlan(selected, rejected, value, exact, time.monotonic() - started)
+
+    def _recipe(self, coffee: Coffee) -> dict:
+        return {ingredient.get_name(): quantity for ingredient, quantity in coffee.get_recipe().items()}
+
+    def _value(self, coffee: Coffee) -> float:
+        return coffee.get_price() if self.objective == BatchObjective.REVENUE else 1
+
+    def _solve_exact(self, coffees: list, stock: tuple, deadline: float) -> list:
+        memo = {}
+
+        def best(index: int, remaining: tuple):
+            if index == len(coffees):
+                return 0, ()
+            key = (index, remaining)
+            if key in memo:
+                return memo[key]
+            if time.monotonic() > deadline:
+                raise TimeoutError()
+
+            _, needs, value, available = coffees[index]
+            if index == len(coffees) - 1:
+                # The last coffee just takes as many orders as the remaining stock allows.
+                count = min([available] + [have // need for have, need in zip(remaining, needs) if need])
+                return count * value, (count,)
+
+            result = (-1, ())
+            count = 0
+            current = remaining
+            while True:
+                sub_value, sub_counts = best(index + 1, current)
+                if count * value + sub_value > result[0]:
+                    result = (count * value + sub_value, (count,) + sub_counts)
+                if count == available:
+                    break
+                current = tuple(have - need for have, need in zip(current, needs))
+                if any(have < 0 for have in current):
+                    break
+                count += 1
+
+            memo[key] = result
+            return result
+
+        return list(best(0, stock)[1])
+
+    def _solve_greedy(self, coffees: list, stock: list) -> list:
+        def density(item):
+            _, needs, value, _ = item
+            pressure = sum(need / have if have else float("inf") for need, have in zip(needs, stock) if need)
+            return value / pressure if pressure else float("inf")
+
+        counts = [0] * len(coffees)
+        for index in sorted(range(len(coffees)), key=lambda i: density(coffees[i]), reverse=True):
+            _, needs, _, available = coffees[index]
+            while counts[index] < available and all(need <= have for need, have in zip(needs, stock)):
+                stock = [have - need for have, need in zip(stock, needs)]
+                counts[index] += 1
+        return counts
+
+
+class BrewingEngine:
+    def __init__(self, coffee_machine: CoffeeMachine, brewing_units: int = 4, brew_time: float = 30.0):
+        self.coffee_machine = coffee_machine
+        self.brewing_units = brewing_units
+        self.brew_time = brew_time
+        self.executor = ThreadPoolExecutor(max_workers=brewing_units)
+        self.order_counter = 0
+        self.completed_orders = []
+        self.started_at = time.monotonic()
+        self.lock = Lock()
+
+    def submit_order(self, coffee: Coffee, payment: Payment) -> Future:
+        with self.lock:
+            self.order_counter += 1
+            order = Order(self.order_counter, coffee, payment)
+        return self.executor.submit(self._brew, order)
+
+    # Plans the whole batch against current stock, then queues the chosen orders in plan order and
+    # rejects the rest straight away. Futures are returned in the order the requests were given.
+    def submit_batch(self, requests: list, objective: BatchObjective = None, time_budget: float = 0.05) -> list:
+        with self.lock:
+            orders = []
+            for coffee, payment in requests:
+                self.order_counter += 1
+                orders.append(Order(self.order_counter, coffee, payment))
+
+        planner = OrderBatchPlanner(self.coffee_machine, objective or BatchObjective.REVENUE, time_budget)
+        plan = planner.plan(orders)
+
+        futures = {}
+        for order in plan.get_selected_orders():
+            futures[order.order_id] = self.executor.submit(self._brew, order)
+        for order in plan.get_rejected_orders():
+            order.started_at = time.monotonic()
+            if order.payment.get_amount() < order.coffee.get_price():
+                order.status = OrderStatus.INSUFFICIENT_PAYMENT
+            else:
+                order.status = OrderStatus.INSUFFICIENT_INGREDIENTS
+            self._complete(order)
+            futures[order.order_id] = Future()
+            futures[order.order_id].set_result(order)
+        return [futures[order.order_id] for order in orders]
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    def _complete(self, order: Order):
+        order.completed_at = time.monotonic()
+        event_type = {
+            OrderStatus.SERVED: SalesEventType.SALE,
+            OrderStatus.INSUFFICIENT_PAYMENT: SalesEventType.INSUFFICIENT_PAYMENT,
+            OrderStatus.INSUFFICIENT_INGREDIENTS: SalesEventType.INSUFFICIENT_INGREDIENTS
+        }[order.status]
+        self.coffee_machine.get_ledger().record(event_type, order.coffee, order.payment.get_amount())
+        with self.lock:
+            self.completed_orders.append(order)
+
+    def _brew(self, order: Order) -> Order:
+        order.started_at = time.monotonic()
+
+        if order.payment.get_amount() < order.coffee.get_price():
+            order.status = OrderStatus.INSUFFICIENT_PAYMENT
+        elif not self.coffee_machine.reserve_ingredients(order.coffee):
+            order.status = OrderStatus.INSUFFICIENT_INGREDIENTS
+        else:
+            order.status = OrderStatus.BREWING
+            time.sleep(self.brew_time)
+            order.status = OrderStatus.SERVED
+
+        self._complete(order)
+        return order
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            orders = list(self.completed_orders)
+
+        served = [order for order in orders if order.status == OrderStatus.SERVED]
+        waits = sorted(order.get_queue_wait() for order in orders)
+        elapsed_minutes = (time.monotonic() - self.started_at) / 60
+        return {
+            "orders": len(orders),
+            "served": len(served),
+            "rejected": len(orders) - len(served),
+            "cups_per_minute": len(served) / elapsed_minutes if elapsed_minutes else 0.0,
+            "avg_queue_wait": sum(waits) / len(waits) if waits else 0.0,
+            "p95_queue_wait": waits[int(len(waits) * 0.95)] if waits else 0.0
+        }
+
+
+class MachineTelemetry:
+    def __init__(self, coffee_machine: CoffeeMachine, window_minutes: int = 60, clock=time.time):
+        self.coffee_machine = coffee_machine
+        self.window_minutes = window_minutes
+        self.clock = clock
+        self.cups_sold = 0
+        self.revenue = 0.0
+        self.sales_by_coffee = {}
+        # Per ingredient: one consumption bucket per minute in a ring, plus the running sum of the window.
+        self.buckets = {name: [0] * window_minutes for name in coffee_machine.ingredients}
+        self.window_totals = {name: 0 for name in coffee_machine.ingredients}
+        self.current_minute = int(clock() // 60)
+
+    def record_sale(self, coffee: Coffee):
+        self._advance(int(self.clock() // 60))
+        self.cups_sold += 1
+        self.revenue += coffee.get_price()
+        self.sales_by_coffee[coffee.get_name()] = self.sales_by_coffee.get(coffee.get_name(), 0) + 1
+
+        slot = self.current_minute % self.window_minutes
+        for ingredient, quantity in coffee.get_recipe().items():
+            self.buckets[ingredient.get_name()][slot] += quantity
+            self.window_totals[ingredient.get_name()] += quantity
+
+    # Units consumed per hour over the trailing window.
+    def get_consumption_rate(self, ingredient_name: str) -> float:
+        self._advance(int(self.clock() // 60))
+        return self.window_totals[ingredient_name] * 60 / self.window_minutes
+
+    def get_hours_until_empty(self, ingredient_name: str) -> float:
+        rate = self.get_consumption_rate(ingredient_name)
+        if rate == 0:
+            return float("inf")
+        return self.coffee_machine.ingredients[ingredient_name].get_quantity() / rate
+
+    def _advance(self, minute: int):
+        elapsed = min(minute - self.current_minute, self.window_minutes)
+        for step in range(1, elapsed + 1):
+            slot = (self.current_minute + step) % self.window_minutes
+            for name, buckets in self.buckets.items():
+                self.window_totals[name] -= buckets[slot]
+                buckets[slot] = 0
+        self.current_minute = max(self.current_minute, minute)
+
+
+class ConsumptionForecaster:
+    HOURS_PER_DAY = 24
+
+    def __init__(self, alpha: float = 0.1, gamma: float = 0.3, utc_offset_hours: int = None, clock=time.time):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.utc_offset_hours = time.localtime().tm_gmtoff // 3600 if utc_offset_hours is None else utc_offset_hours
+        self.clock = clock
+        # (machine_id, ingredient) -> [level, 24 seasonal factors, current hour index, units so far this hour]
+        self.series = {}
+        self.lock = Lock()
+
+    def on_sale(self, coffee_machine: CoffeeMachine, coffee: Coffee):
+        now = self.clock()
+        for ingredient, quantity in coffee.get_recipe().items():
+            self.record(coffee_machine.get_machine_id(), ingredient.get_name(), quantity, now)
+
+    def record(self, machine_id: str, ingredient_name: str, quantity: int, at: float):
+        with self.lock:
+            series = self._get_series(machine_id, ingredient_name, int(at // 3600))
+            self._roll_forward(series, int(at // 3600))
+            series[3] += quantity
+
+    # Forecast units/hour for the given hour of day: smoothed level scaled by that hour's seasonal factor.
+    def get_rate(self, machine_id: str, ingredient_name: str, hour_of_day: int) -> float:
+        series = self.series.get((machine_id, ingredient_name))
+        if series is None:
+            return 0.0
+        return series[0] * series[1][hour_of_day]
+
+    def predict_depletion(self, machine_id: str, ingredient_name: str, quantity: float, now: float, horizon_hours: int = 168) -> float:
+        with self.lock:
+            series = self.series.get((machine_id, ingredient_name))
+            if series is not None:
+                self._roll_forward(series, int(now // 3600))
+
+        at = now
+        remaining = quantity
+        if remaining <= 0:
+            return at
+        for _ in range(horizon_hours):
+            rate = self.get_rate(machine_id, ingredient_name, self._hour_of_day(int(at // 3600)))
+            hour_end = (int(at // 3600) + 1) * 3600
+            needed = rate * (hour_end - at) / 3600
+            if rate > 0 and needed >= remaining:
+                return at + remaining / rate * 3600
+            remaining -= needed
+            at = hour_end
+        return float("inf")
+
+    def forecast_consumption(self, machine_id: str, ingredient_name: str, start: float, hours: int) -> float:
+        total = 0.0
+        for hour in range(int(start // 3600), int(start // 3600) + hours):
+            total += self.get_rate(machine_id, ingredient_name, self._hour_of_day(hour))
+        return total
+
+    def _hour_of_day(self, hour: int) -> int:
+        return (hour + self.utc_offset_hours) % self.HOURS_PER_DAY
+
+    def _get_series(self, machine_id: str, ingredient_name: str, hour: int):
+        key = (machine_id, ingredient_name)
+        if key not in self.series:
+            self.series[key] = [0.0, [1.0] * self.HOURS_PER_DAY, hour, 0]
+        return self.series[key]
+
+    # Each completed hour (including silent ones) updates the level and that hour's seasonal factor.
+    def _roll_forward(self, series, hour: int):
+        closed_hours = min(hour - series[2], 7 * self.HOURS_PER_DAY)
+        for step in range(closed_hours):
+            observed = series[3] if step == 0 else 0
+            season = series[1]
+            hour_of_day = self._hour_of_day(series[2] + step)
+
+            if series[0] == 0:
+                series[0] = float(observed)
+            else:
+                series[0] = self.alpha * observed / season[hour_of_day] + (1 - self.alpha) * series[0]
+            if series[0] > 0:
+                season[hour_of_day] = self.gamma * observed / series[0] + (1 - self.gamma) * season[hour_of_day]
+                mean = sum(season) / self.HOURS_PER_DAY
+                if mean > 0:
+                    series[1] = [factor / mean for factor in season]
+        if hour > series[2]:
+            series[2] = hour
+            series[3] = 0
+
+
+class RestockItem:
+    def __init__(self, machine_id: str, ingredient_name: str, depletes_at: float, due_by: float, amount: int):
+        self.machine_id = machine_id
+        self.ingredient_name = ingredient_name
+        self.depletes_at = depletes_at
+        self.due_by = due_by
+        self.amount = amount
+
+
+class RestockBatch:
+    def __init__(self, dispatch_at: float, items: list):
+        self.dispatch_at = dispatch_at
+        self.items = items
+
+    def __str__(self):
+        machines = len({item.machine_id for item in self.items})
+        return f"Restock batch at {time.strftime('%H:%M', time.localtime(self.dispatch_at))}: {len(self.items)} items across {machines} machines"
+
+
+class RestockPlanner:
+    def __init__(
+        self,
+        fleet: CoffeeFleet,
+        lead_time_hours: float = 2.0,
+        batch_window_hours: float = 1.0,
+        planning_horizon_hours: float = 8.0,
+        cover_hours: int = 24
+    ):
+        self.fleet = fleet
+        self.lead_time_hours = lead_time_hours
+        self.batch_window_hours = batch_window_hours
+        self.planning_horizon_hours = planning_horizon_hours
+        self.cover_hours = cover_hours
+
+    # Every ingredient due for restock inside the horizon is grouped, by deadline, into batches that are
+    # dispatched at the earliest deadline they contain.
+    def plan(self, now: float = None) -> list:
+        now = self.fleet.clock() if now is None else now
+        forecaster = self.fleet.forecaster
+        horizon = now + self.planning_horizon_hours * 3600
+
+        items = []
+        for machine_id, coffee_machine in list(self.fleet.machines.items()):
+            for name, ingredient in coffee_machine.ingredients.items():
+                depletes_at = forecaster.predict_depletion(machine_id, name, ingredient.get_quantity(), now)
+                due_by = max(depletes_at - self.lead_time_hours * 3600, now)
+                if due_by > horizon:
+                    continue
+                needed = forecaster.forecast_consumption(machine_id, name, now, self.cover_hours)
+                amount = max(int(needed - ingredient.get_quantity()) + 1, 0)
+                items.append(RestockItem(machine_id, name, depletes_at, due_by, amount))
+
+        batches = []
+        for item in sorted(items, key=lambda item: item.due_by):
+            if batches and item.due_by < batches[-1].dispatch_at + self.batch_window_hours * 3600:
+                batches[-1].items.append(item)
+            else:
+                batches.append(RestockBatch(item.due_by, [item]))
+        return batches
+
+
+class CoffeeFleet:
+    def __init__(self, window_minutes: int = 60, clock=time.time):
+        self.window_minutes = window_minutes
+        self.clock = clock
+        self.machines = {}
+        self.telemetry = {}
+        self.cups_sold = 0
+        self.revenue = 0.0
+        self.sales_by_coffee = {}
+        self.inventory = {}
+        self.forecaster = ConsumptionForecaster(clock=clock)
+        self.lock = Lock()
+
+    def add_machine(self, machine_id: str, ingredient_quantities: dict = None, menu: dict = None) -> CoffeeMachine:
+        coffee_machine = CoffeeMachine(machine_id, ingredient_quantities, menu)
+        with self.lock:
+            if machine_id in self.machines:
+                raise Exception("Machine already exists")
+            self.machines[machine_id] = coffee_machine
+            self.telemetry[machine_id] = MachineTelemetry(coffee_machine, self.window_minutes, self.clock)
+            for name, ingredient in coffee_machine.ingredients.items():
+                self.inventory[name] = self.inventory.get(name, 0) + ingredient.get_quantity()
+        coffee_machine.add_sale_listener(self._on_sale)
+        coffee_machine.add_sale_listener(self.forecaster.on_sale)
+        coffee_machine.add_restock_listener(self._on_restock)
+        return coffee_machine
+
+    def remove_machine(self, machine_id: str):
+        with self.lock:
+            coffee_machine = self.machines.pop(machine_id)
+            telemetry = self.telemetry.pop(machine_id)
+            self.cups_sold -= telemetry.cups_sold
+            self.revenue -= telemetry.revenue
+            for name, count in telemetry.sales_by_coffee.items():
+                self.sales_by_coffee[name] -= count
+            for name, ingredient in coffee_machine.ingredients.items():
+                self.inventory[name] -= ingredient.get_quantity()
+        coffee_machine.remove_sale_listener(self._on_sale)
+        coffee_machine.remove_sale_listener(self.forecaster.on_sale)
+        coffee_machine.remove_restock_listener(self._on_restock)
+
+    def get_machine(self, machine_id: str) -> CoffeeMachine:
+        return self.machines[machine_id]
+
+    def get_telemetry(self, machine_id: str) -> MachineTelemetry:
+        return self.telemetry[machine_id]
+
+    def get_summary(self) -> dict:
+        with self.lock:
+            return {
+                "machines": len(self.machines),
+                "cups_sold": self.cups_sold,
+                "revenue": self.revenue,
+                "sales_by_coffee": dict(self.sales_by_coffee),
+                "inventory": dict(self.inventory)
+            }
+
+    def get_revenue(self, start: float = None, end: float = None) -> float:
+        return sum(self.get_revenue_by_machine(start, end).values())
+
+    def get_revenue_by_machine(self, start: float = None, end: float = None) -> dict:
+        with self.lock:
+            machines = list(self.machines.items())
+        return {machine_id: coffee_machine.get_ledger().get_revenue(start, end) for machine_id, coffee_machine in machines}
+
+    # One pass over cached per-machine counters; nothing is recomputed from sales history.
+    def get_machines_running_out(self, ingredient_name: str, within_hours: float = 1.0) -> list:
+        running_out = []
+        with self.lock:
+            for machine_id, machine_telemetry in self.telemetry.items():
+                if ingredient_name not in machine_telemetry.window_totals:
+                    continue
+                hours = machine_telemetry.get_hours_until_empty(ingredient_name)
+                if hours <= within_hours:
+                    running_out.append((machine_id, hours))
+        return sorted(running_out, key=lambda item: item[1])
+
+    # A sale or restock already being notified when its machine is removed is ignored.
+    def _on_sale(self, coffee_machine: CoffeeMachine, coffee: Coffee):
+        with self.lock:
+            if self.machines.get(coffee_machine.get_machine_id()) is not coffee_machine:
+                return
+            self.telemetry[coffee_machine.get_machine_id()].record_sale(coffee)
+            self.cups_sold += 1
+            self.revenue += coffee.get_price()
+            self.sales_by_coffee[coffee.get_name()] = self.sales_by_coffee.get(coffee.get_name(), 0) + 1
+            for ingredient, quantity in coffee.get_recipe().items():
+                self.inventory[ingredient.get_name()] -= quantity
+
+    def _on_restock(self, coffee_machine: CoffeeMachine, ingredient_name: str, amount: int):
+        with self.lock:
+            if self.machines.get(coffee_machine.get_machine_id()) is not coffee_machine:
+                return
+            self.inventory[ingredient_name] = self.inventory.get(ingredient_name, 0) + amount
+
+
 class CoffeeVendingMachineDemo:
     @staticmethod
     def run():
@@ -157,5 +887,67 @@ class CoffeeVendingMachineDemo:
         latte = coffee_machine.select_coffee("Latte")
         coffee_machine.dispense_coffee(latte, Payment(2.0))
 
+        print("----------------------------------------")
+
+        engine = BrewingEngine(coffee_machine, brewing_units=3, brew_time=0.05)
+        futures = [engine.submit_order(latte, Payment(5.0)) for _ in range(10)]
+        for future in futures:
+            order = future.result()
+            print(f"Order {order.order_id}: {order.get_status().name}")
+        engine.shutdown()
+        print(f"Brewing engine stats: {engine.get_stats()}")
+        print(f"Milk left: {coffee_machine.ingredients['Milk'].get_quantity()}")
+
+        print("----------------------------------------")
+
+        batch_machine = CoffeeMachine("batch-demo", {"Coffee": 6, "Water": 6, "Milk": 5})
+        batch_engine = BrewingEngine(batch_machine, brewing_units=2, brew_time=0.01)
+        espresso, cappuccino, latte = batch_machine.coffee_menu
+        requests = [(espresso, Payment(3.0))] * 3 + [(latte, Payment(4.0))] * 3 + [(cappuccino, Payment(4.0))] * 3
+        for future in batch_engine.submit_batch(requests):
+            order = future.result()
+            print(f"Batch order {order.order_id} ({order.coffee.get_name()}): {order.get_status().name}")
+        batch_engine.shutdown()
+
+        print("----------------------------------------")
+
+        fleet = CoffeeFleet()
+        for i in range(300):
+            fleet.add_machine(f"floor-{i:03d}", {"Coffee": 500, "Water": 500, "Milk": 40 + i % 50})
+        for i in range(300):
+            fleet_machine = fleet.get_machine(f"floor-{i:03d}")
+            for _ in range(i % 20):
+                fleet_machine.reserve_ingredients(fleet_machine.coffee_menu[2])
+        print(f"Fleet summary: {fleet.get_summary()}")
+        print(f"Machines out of milk within an hour: {len(fleet.get_machines_running_out('Milk', 1.0))}")
+
+        print("----------------------------------------")
+
+        simulated_time = [time.time() - 3 * 24 * 3600]
+        forecast_fleet = CoffeeFleet(clock=lambda: simulated_time[0])
+        for i in range(5):
+            forecast_fleet.add_machine(f"lobby-{i}", {"Coffee": 1000, "Water": 1000, "Milk": 150 + 50 * i})
+        for _ in range(3 * 24):
+            cups = 12 if time.localtime(simulated_time[0]).tm_hour in (8, 9, 12, 13) else 2
+            for _ in range(cups):
+                for i in range(5):
+                    forecast_machine = forecast_fleet.get_machine(f"lobby-{i}")
+                    forecast_machine.restock("Milk", 2)
+                    forecast_machine.reserve_ingredients(forecast_machine.coffee_menu[2])
+            simulated_time[0] += 3600
+        for batch in RestockPlanner(forecast_fleet, planning_horizon_hours=48).plan():
+            print(batch)
+
+        print("----------------------------------------")
+
+        ledger = SalesLedger("year-demo")
+        year_start = time.time() - 365 * 24 * 3600
+        for i in range(365 * 24 * 12):
+            ledger.record(SalesEventType.SALE, latte if i % 3 else espresso, 5.0, year_start + i * 300)
+        query_start = time.perf_counter()
+        summary = ledger.get_summary(year_start + 1234, year_start + 360 * 24 * 3600)
+        query_time = (time.perf_counter() - query_start) * 1000
+        print(f"Ledger with {ledger.get_event_count()} events: {summary} in {query_time:.1f}ms")
+
 if __name__ == "__main__":
     CoffeeVendingMachineDemo.run()
\ No newline at end of file
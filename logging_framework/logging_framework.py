@@ -2,6 +2,22 @@ from __future__ import annotations
 from enum import Enum
 from abc import ABC, abstractmethod
 from datetime import datetime
+from collections import OrderedDict, deque
+from queue import Queue
+from threading import Condition, Lock, Thread
+from typing import List
+import atexit
+import contextlib
+import gzip
+import json
+import os
+import mmap
+import multiprocessing
+import shutil
+import sqlite3
+import struct
+import sys
+import time
 # import psycopg2
 
 # 1. The logging framework should support different log levels, such as DEBUG, INFO, WARNING, ERROR, and FATAL.
@@ -19,23 +35,60 @@ class LogLevel(Enum):
     FATAL = 5
 
 
+class TimestampCache:
+    def __init__(self):
+        self.cached = (None, "")
+
+    # The "YYYY-MM-DD HH:MM:SS" prefix is formatted once per second; only the microseconds change.
+    def format(self, timestamp: float) -> str:
+        second = int(timestamp)
+        cached_second, prefix = self.cached
+        if cached_second != second:
+            prefix = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+            self.cached = (second, prefix)
+        return f"{prefix}.{int((timestamp - second) * 1000000):06d}"
+
+
 class LogMessage:
-    def __init__(self, level: LogLevel, message: str):
+    timestamp_cache = TimestampCache()
+
+    def __init__(self, level: LogLevel, message: str, args: tuple = (), fields: dict = None):
         self.level = level
         self.message = message
-        self.timestamp = datetime.now()
+        self.args = args
+        self.formatted = None if args else message
+        self.fields = fields or {}
+        self.timestamp = time.time()
+        self.line = None
 
     def get_level(self):
         return self.level
     
+    # The template and args are never mutated; the result is published in one assignment, so appender
+    # threads sharing this record at worst format it twice.
+    # A template that does not match its args falls back to the template and the args' repr.
     def get_message(self):
-        return self.message
+        if self.formatted is None:
+            try:
+                self.formatted = self.message % self.args
+            except (TypeError, ValueError):
+                self.formatted = f"{self.message} {self.args!r}"
+        return self.formatted
     
     def get_timestamp(self):
-        return self.timestamp
+        return datetime.fromtimestamp(self.timestamp)
+
+    def get_fields(self):
+        return self.fields
+
+    def get_formatted_timestamp(self):
+        return LogMessage.timestamp_cache.format(self.timestamp)
     
+    # Rendered once and reused by every appender the record is routed to.
     def __str__(self):
-        return f"[{self.level.name}] {self.timestamp} - {self.message}"
+        if self.line is None:
+            self.line = "[" + self.level.name + "] " + self.get_formatted_timestamp() + " - " + self.get_message()
+        return self.line
     
 
 class LogAppender(ABC):
@@ -43,6 +96,13 @@ class LogAppender(ABC):
     def append(self, log_message: LogMessage):
         pass
 
+    def append_batch(self, log_messages: List[LogMessage]):
+        for log_message in log_messages:
+            self.append(log_message)
+
+    def close(self):
+        pass
+
 
 class FileAppender(LogAppender):
     def __init__(self, file_path):
@@ -53,28 +113,479 @@ class FileAppender(LogAppender):
             file.write(str(log_message) + "\n")
 
 
+class RollingFileAppender(LogAppender):
+    def __init__(
+        self,
+        file_path,
+        buffer_size: int = 64 * 1024,
+        fsync_interval: float = 1.0,
+        max_bytes: int = 100 * 1024 * 1024,
+        rotation_interval: float = None,
+        compress: bool = True
+    ):
+        self.path = "./logging_framework/" + file_path
+        self.buffer_size = buffer_size
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.rotation_interval = rotation_interval
+        self.compress = compress
+        self.lock = Lock()
+        self.timer = Condition(self.lock)
+        self.compressors: List[Thread] = []
+        self._open()
+        self.syncer = Thread(target=self._sync_periodically, daemon=True)
+        self.syncer.start()
+
+    def append(self, log_message: LogMessage):
+        self._write(str(log_message) + "\n")
+
+    def append_batch(self, log_messages: List[LogMessage]):
+        self._write("".join(str(log_message) + "\n" for log_message in log_messages))
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self._sync()
+                self.file.close()
+                self.file = None
+                self.timer.notify()
+        self.syncer.join()
+        for compressor in self.compressors:
+            compressor.join()
+
+    def _open(self):
+        self.file = open(self.path, "a", buffering=self.buffer_size)
+        self.bytes_written = self.file.tell()
+        self.opened_at = time.monotonic()
+        self.last_sync = self.opened_at
+        self.unsynced = False
+
+    def _write(self, text: str):
+        with self.lock:
+            if self.file is None:
+                raise Exception("Appender is closed")
+
+            now = time.monotonic()
+            if self._should_rotate(now):
+                self._rotate()
+                now = self.opened_at
+
+            self.file.write(text)
+            # file.tell() counts bytes, so rotation must too; ASCII text skips the encode.
+            self.bytes_written += len(text) if text.isascii() else len(text.encode(self.file.encoding))
+            self.unsynced = True
+            if now - self.last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _should_rotate(self, now: float) -> bool:
+        if self.bytes_written >= self.max_bytes:
+            return True
+        return self.rotation_interval is not None and now - self.opened_at >= self.rotation_interval
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync = time.monotonic()
+        self.unsynced = False
+
+    # Lines written just before an idle period would otherwise sit in the buffer until the next append.
+    def _sync_periodically(self):
+        with self.lock:
+            while self.file is not None:
+                self.timer.wait(self.fsync_interval)
+                if self.file is not None and self.unsynced and time.monotonic() - self.last_sync >= self.fsync_interval:
+                    self._sync()
+
+    def _rotate(self):
+        self._sync()
+        self.file.close()
+
+        rotated_path = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        os.rename(self.path, rotated_path)
+        self._open()
+
+        if self.compress:
+            self.compressors = [c for c in self.compressors if c.is_alive()]
+            compressor = Thread(target=self._compress, args=(rotated_path,), daemon=True)
+            self.compressors.append(compressor)
+            compressor.start()
+
+    @staticmethod
+    def _compress(path: str):
+        try:
+            with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(path)
+        except Exception:
+            print(f"Error when compressing {path}")
+
+
+# Record layout: length (I), timestamp (d), level (B), message length (I), field count (H), message, fields.
+# Each field is key length (H), key, type tag (B), then a q / d / length-prefixed UTF-8 value.
+RECORD_HEADER = struct.Struct("<IdBIH")
+# Index entry per block: start and end file offsets (QQ), record count (I), min/max timestamp (dd), level bit mask (B).
+INDEX_ENTRY = struct.Struct("<QQIddB")
+FIELD_KEY = struct.Struct("<H")
+FIELD_LENGTH = struct.Struct("<I")
+FIELD_INT = struct.Struct("<q")
+FIELD_FLOAT = struct.Struct("<d")
+
+
+class BinaryFileAppender(LogAppender):
+    def __init__(self, file_path, block_size: int = 1024, buffer_size: int = 64 * 1024):
+        self.path = "./logging_framework/" + file_path
+        self.block_size = block_size
+        self.lock = Lock()
+        self._recover()
+        self.file = open(self.path, "ab", buffering=buffer_size)
+        self.index = open(self.path + ".idx", "ab")
+        self._start_block()
+
+    def append(self, log_message: LogMessage):
+        record = self._encode(log_message)
+        with self.lock:
+            self._write(record, log_message)
+
+    def append_batch(self, log_messages: List[LogMessage]):
+        records = [self._encode(log_message) for log_message in log_messages]
+        with self.lock:
+            for record, log_message in zip(records, log_messages):
+                self._write(record, log_message)
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self._finish_block()
+            self.file.close()
+            self.index.close()
+            self.file = None
+
+    # After an unclean shutdown the file can end in complete records that no index entry covers, and in a
+    # torn record. The torn bytes are cut off and the complete tail gets its own index entry, so new blocks
+    # written at EOF do not leave those records in a gap the reader never scans.
+    def _recover(self):
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        indexed_end = 0
+        with open(self.path + ".idx", "a+b") as index:
+            index.seek(0)
+            entries = index.read()
+            valid = 0
+            for entry in INDEX_ENTRY.iter_unpack(entries[:len(entries) - len(entries) % INDEX_ENTRY.size]):
+                if entry[1] > size:
+                    break
+                valid += 1
+                indexed_end = entry[1]
+            index.truncate(valid * INDEX_ENTRY.size)
+
+            with open(self.path, "r+b") as file:
+                file.seek(indexed_end)
+                tail = file.read()
+                offset = count = levels = 0
+                block_min = float("inf")
+                block_max = float("-inf")
+                while offset + RECORD_HEADER.size <= len(tail):
+                    length, timestamp, level, _, _ = RECORD_HEADER.unpack_from(tail, offset)
+                    if length < RECORD_HEADER.size or offset + length > len(tail):
+                        break
+                    offset += length
+                    count += 1
+                    block_min = min(block_min, timestamp)
+                    block_max = max(block_max, timestamp)
+                    levels |= 1 << level
+                file.truncate(indexed_end + offset)
+
+            if count:
+                index.write(INDEX_ENTRY.pack(indexed_end, indexed_end + offset, count, block_min, block_max, levels))
+
+    def _start_block(self):
+        self.block_offset = self.file.tell()
+        self.block_count = 0
+        self.block_min = float("inf")
+        self.block_max = float("-inf")
+        self.block_levels = 0
+
+    def _finish_block(self):
+        if self.block_count == 0:
+            return
+        self.file.flush()
+        self.index.write(INDEX_ENTRY.pack(
+            self.block_offset, self.file.tell(), self.block_count, self.block_min, self.block_max, self.block_levels
+        ))
+        self.index.flush()
+        self._start_block()
+
+    def _write(self, record: bytes, log_message: LogMessage):
+        if self.file is None:
+            raise Exception("Appender is closed")
+
+        self.file.write(record)
+        self.block_count += 1
+        self.block_min = min(self.block_min, log_message.timestamp)
+        self.block_max = max(self.block_max, log_message.timestamp)
+        self.block_levels |= 1 << log_message.get_level().value
+        if self.block_count >= self.block_size:
+            self._finish_block()
+
+    @staticmethod
+    def _encode(log_message: LogMessage) -> bytes:
+        message = log_message.get_message().encode("utf-8")
+        parts = [b"", message]
+        for key, value in log_message.get_fields().items():
+            key = str(key).encode("utf-8")
+            parts.append(FIELD_KEY.pack(len(key)) + key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                value = str(value).encode("utf-8")
+                parts.append(b"\x00" + FIELD_LENGTH.pack(len(value)) + value)
+            elif isinstance(value, int):
+                parts.append(b"\x01" + FIELD_INT.pack(value))
+            else:
+                parts.append(b"\x02" + FIELD_FLOAT.pack(value))
+        body_length = sum(len(part) for part in parts)
+        parts[0] = RECORD_HEADER.pack(
+            RECORD_HEADER.size + body_length,
+            log_message.timestamp,
+            log_message.get_level().value,
+            len(message),
+            len(log_message.get_fields())
+        )
+        return b"".join(parts)
+
+
+class BinaryLogReader:
+    def __init__(self, file_path):
+        self.path = "./logging_framework/" + file_path
+        self.file = open(self.path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.blocks = self._load_index()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    # Blocks whose time range or level mask cannot match are skipped outright; inside a block only the
+    # fixed header is unpacked until a record matches.
+    def query(self, start: float = None, end: float = None, levels: List[LogLevel] = None):
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        level_mask = sum(1 << level.value for level in levels) if levels else 0xFF
+
+        for offset, _, count, block_min, block_max, block_levels in self.blocks:
+            if block_max < start or block_min > end or not block_levels & level_mask:
+                continue
+            for record_offset, timestamp, level in self._scan(offset, count):
+                if start <= timestamp <= end and (1 << level) & level_mask:
+                    yield self._decode(record_offset)
+
+    def _load_index(self):
+        blocks = []
+        indexed_end = 0
+        if os.path.exists(self.path + ".idx"):
+            with open(self.path + ".idx", "rb") as index:
+                for entry in INDEX_ENTRY.iter_unpack(index.read()):
+                    if entry[1] > self.size:
+                        break
+                    blocks.append(entry)
+                    indexed_end = entry[1]
+        # Records written after the last complete block have no index entry yet and are scanned as one block.
+        if indexed_end < self.size:
+            blocks.append((indexed_end, self.size, -1, float("-inf"), float("inf"), 0xFF))
+        return blocks
+
+    def _scan(self, offset: int, count: int):
+        scanned = 0
+        while offset + RECORD_HEADER.size <= self.size and scanned != count:
+            length, timestamp, level, _, _ = RECORD_HEADER.unpack_from(self.data, offset)
+            if offset + length > self.size:
+                return
+            yield offset, timestamp, level
+            offset += length
+            scanned += 1
+
+    def _decode(self, offset: int) -> LogMessage:
+        _, timestamp, level, message_length, field_count = RECORD_HEADER.unpack_from(self.data, offset)
+        position = offset + RECORD_HEADER.size
+        message = bytes(self.data[position:position + message_length]).decode("utf-8")
+        position += message_length
+
+        fields = {}
+        for _ in range(field_count):
+            key_length = FIELD_KEY.unpack_from(self.data, position)[0]
+            position += FIELD_KEY.size
+            key = bytes(self.data[position:position + key_length]).decode("utf-8")
+            position += key_length
+            tag = self.data[position]
+            position += 1
+            if tag == 1:
+                fields[key] = FIELD_INT.unpack_from(self.data, position)[0]
+                position += FIELD_INT.size
+            elif tag == 2:
+                fields[key] = FIELD_FLOAT.unpack_from(self.data, position)[0]
+                position += FIELD_FLOAT.size
+            else:
+                value_length = FIELD_LENGTH.unpack_from(self.data, position)[0]
+                position += FIELD_LENGTH.size
+                fields[key] = bytes(self.data[position:position + value_length]).decode("utf-8")
+                position += value_length
+
+        log_message = LogMessage(LogLevel(level), message, fields=fields)
+        log_message.timestamp = timestamp
+        return log_message
+
+
+class BinaryLogQueryTool:
+
+    # Usage: logging_framework.py query <file> [LEVEL[,LEVEL...]] [start ISO time] [end ISO time]
+    @staticmethod
+    def run(argv: List[str]):
+        levels = [LogLevel[name] for name in argv[1].upper().split(",")] if len(argv) > 1 else None
+        start = datetime.fromisoformat(argv[2]).timestamp() if len(argv) > 2 else None
+        end = datetime.fromisoformat(argv[3]).timestamp() if len(argv) > 3 else None
+
+        reader = BinaryLogReader(argv[0])
+        try:
+            for log_message in reader.query(start, end, levels):
+                fields = " ".join(f"{key}={value}" for key, value in log_message.get_fields().items())
+                print(f"{log_message} {fields}".rstrip())
+        finally:
+            reader.close()
+
+
+class ConnectionPool:
+    def __init__(self, db_url, size: int):
+        self.connections = Queue()
+        # Each ":memory:" connection would get its own empty database; a named shared-cache database is
+        # shared by every connection in this pool and lives until the last one closes.
+        uri = db_url == ":memory:"
+        if uri:
+            db_url = f"file:logs-{id(self)}?mode=memory&cache=shared"
+        for _ in range(size):
+            connection = sqlite3.connect(db_url, timeout=0.05, check_same_thread=False, uri=uri)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.connections.put(connection)
+        self.size = size
+
+    def acquire(self):
+        return self.connections.get()
+
+    def release(self, connection):
+        self.connections.put(connection)
+
+    def close(self):
+        for _ in range(self.size):
+            self.connections.get().close()
+
+
 class DatabaseAppender(LogAppender):
-    def __init__(self, db_url, username, password):
+    def __init__(
+        self,
+        db_url,
+        username=None,
+        password=None,
+        pool_size: int = 2,
+        batch_size: int = 5000,
+        flush_interval: float = 1.0,
+        max_retries: int = 10
+    ):
         self.db_url = db_url
         self.username = username
         self.password = password
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.pool = ConnectionPool(db_url, pool_size)
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.failed_count = 0
+        self.closed = False
+        self.lock = Lock()
+        self.timer = Condition(self.lock)
 
-    def append(self, log_message: LogMessage):
+        connection = self.pool.acquire()
         try:
+            connection.execute("CREATE TABLE IF NOT EXISTS logs (level TEXT, message TEXT, timestamp REAL)")
+            connection.commit()
+        finally:
+            self.pool.release(connection)
+
+        self.flusher = Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+
+    def append(self, log_message: LogMessage):
+        self.append_batch([log_message])
+
+    def append_batch(self, log_messages: List[LogMessage]):
+        rows = [(m.get_level().name, m.get_message(), m.timestamp) for m in log_messages]
+        with self.lock:
+            if self.closed:
+                raise Exception("Appender is closed")
+            self.buffer.extend(rows)
+            if len(self.buffer) < self.batch_size:
+                return
+            batch = self._take_buffer()
+        self._insert(batch)
+
+    def flush(self):
+        with self.lock:
+            batch = self._take_buffer()
+        self._insert(batch)
 
-            print("DataBase Logic...")
-
-            # connection = psycopg2.connect(self.db_url, self.username, self.password)
-            # cursor = connection.cursor()
-            # cursor.execute(
-            #     "INSERT INTO logs (level, message, timestamp) VALUES (%s, %s, %s)",
-            #     (log_message.get_level().name, log_message.get_message(), log_message.get_timestamp())
-            # )
-            # connection.commit()
-            # cursor.close()
-            # connection.close()
-        except:
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.timer.notify()
+        self.flusher.join()
+        self.flush()
+        self.pool.close()
+
+    def get_failed_count(self):
+        return self.failed_count
+
+    def _take_buffer(self):
+        batch = self.buffer
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        return batch
+
+    def _flush_periodically(self):
+        while True:
+            with self.lock:
+                self.timer.wait(self.flush_interval)
+                if self.closed:
+                    return
+                if time.monotonic() - self.last_flush < self.flush_interval:
+                    continue
+                batch = self._take_buffer()
+            self._insert(batch)
+
+    def _insert(self, batch):
+        if not batch:
+            return
+
+        connection = self.pool.acquire()
+        try:
+            for attempt in range(self.max_retries):
+                try:
+                    connection.executemany("INSERT INTO logs (level, message, timestamp) VALUES (?, ?, ?)", batch)
+                    connection.commit()
+                    return
+                except sqlite3.OperationalError as e:
+                    connection.rollback()
+                    if "locked" not in str(e) and "busy" not in str(e):
+                        break
+                    time.sleep(0.001 * 2 ** attempt)
+            with self.lock:
+                self.failed_count += len(batch)
             print(f"Error when logging in database")
+        finally:
+            self.pool.release(connection)
 
 
 class ConsoleAppender(LogAppender):
@@ -82,22 +593,426 @@ class ConsoleAppender(LogAppender):
         print(log_message)
 
 
+class OverflowPolicy(Enum):
+    BLOCK = 1
+    DROP_OLDEST = 2
+    DROP_DEBUG_FIRST = 3
+
+
+class AsyncAppender(LogAppender):
+    def __init__(
+        self,
+        appender: LogAppender,
+        capacity: int = 10000,
+        batch_size: int = 512,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK
+    ):
+        self.appender = appender
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.overflow_policy = overflow_policy
+        self.queue = deque()
+        self.debug_count = 0
+        self.dropped_count = 0
+        self.dropped_by_level = {level: 0 for level in LogLevel}
+        self.in_flight = 0
+        self.closed = False
+        self.lock = Lock()
+        self.not_empty = Condition(self.lock)
+        self.not_full = Condition(self.lock)
+        self.writer = Thread(target=self._drain, daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def append(self, log_message: LogMessage):
+        with self.lock:
+            if self.closed:
+                raise Exception("Appender is closed")
+
+            if len(self.queue) >= self.capacity:
+                if self.overflow_policy == OverflowPolicy.BLOCK:
+                    while len(self.queue) >= self.capacity and not self.closed:
+                        self.not_full.wait()
+                    if self.closed:
+                        raise Exception("Appender is closed")
+                elif self.overflow_policy == OverflowPolicy.DROP_OLDEST:
+                    self._record_drop(self._dequeue_oldest())
+                elif not self._make_room_for(log_message):
+                    self._record_drop(log_message)
+                    return
+
+            self.queue.append(log_message)
+            if log_message.get_level() == LogLevel.DEBUG:
+                self.debug_count += 1
+            self.not_empty.notify()
+
+    def flush(self):
+        with self.lock:
+            while self.queue or self.in_flight:
+                self.not_full.wait()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.not_empty.notify()
+            self.not_full.notify_all()
+        self.writer.join()
+        self.appender.close()
+
+    def get_dropped_count(self):
+        return self.dropped_count
+
+    def get_dropped_by_level(self):
+        return dict(self.dropped_by_level)
+
+    # DEBUG records are sacrificed before anything else; once none are queued the oldest record goes.
+    def _make_room_for(self, log_message: LogMessage) -> bool:
+        if self.debug_count > 0:
+            for i, queued in enumerate(self.queue):
+                if queued.get_level() == LogLevel.DEBUG:
+                    del self.queue[i]
+                    self.debug_count -= 1
+                    self._record_drop(queued)
+                    return True
+        if log_message.get_level() == LogLevel.DEBUG:
+            return False
+        self._record_drop(self._dequeue_oldest())
+        return True
+
+    def _dequeue_oldest(self) -> LogMessage:
+        log_message = self.queue.popleft()
+        if log_message.get_level() == LogLevel.DEBUG:
+            self.debug_count -= 1
+        return log_message
+
+    def _record_drop(self, log_message: LogMessage):
+        self.dropped_count += 1
+        self.dropped_by_level[log_message.get_level()] += 1
+
+    def _drain(self):
+        while True:
+            with self.lock:
+                while not self.queue and not self.closed:
+                    self.not_empty.wait()
+                if not self.queue and self.closed:
+                    self.not_full.notify_all()
+                    return
+
+                batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+                self.debug_count -= sum(1 for log_message in batch if log_message.get_level() == LogLevel.DEBUG)
+                self.in_flight = len(batch)
+                self.not_full.notify_all()
+
+            try:
+                self._write_batch(batch)
+            finally:
+                with self.lock:
+                    self.in_flight = 0
+                    self.not_full.notify_all()
+
+    # A failed batch is retried record by record so one bad record costs only itself; records that
+    # still fail are counted as dropped. A sink that wrote part of the batch before failing may see
+    # those records twice.
+    def _write_batch(self, batch: List[LogMessage]):
+        try:
+            self.appender.append_batch(batch)
+            return
+        except Exception:
+            print("Error when flushing log batch")
+        for log_message in batch:
+            try:
+                self.appender.append(log_message)
+            except Exception:
+                with self.lock:
+                    self._record_drop(log_message)
+
+
+class AppenderRoute:
+    def __init__(self, appender: LogAppender, min_level: LogLevel = LogLevel.DEBUG, predicate=None):
+        self.appender = appender
+        self.min_level = min_level.value
+        self.predicate = predicate
+
+    def accepts(self, log_message: LogMessage) -> bool:
+        if log_message.get_level().value < self.min_level:
+            return False
+        return self.predicate is None or self.predicate(log_message)
+
+
+class RoutingAppender(LogAppender):
+    def __init__(self):
+        self.routes = ()
+        self.lock = Lock()
+
+    # Isolated sinks get their own AsyncAppender queue so a stalled sink cannot hold up the others;
+    # the overflow policy must not block, or a full queue would stall the producer after all.
+    def add_appender(
+        self,
+        appender: LogAppender,
+        min_level: LogLevel = LogLevel.DEBUG,
+        predicate=None,
+        isolated: bool = False,
+        capacity: int = 10000,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_DEBUG_FIRST
+    ) -> AppenderRoute:
+        if isolated:
+            appender = AsyncAppender(appender, capacity=capacity, overflow_policy=overflow_policy)
+        route = AppenderRoute(appender, min_level, predicate)
+        with self.lock:
+            self.routes = self.routes + (route,)
+        return route
+
+    def remove_appender(self, route: AppenderRoute):
+        with self.lock:
+            self.routes = tuple(r for r in self.routes if r is not route)
+
+    def get_min_level(self) -> LogLevel:
+        if not self.routes:
+            return LogLevel.FATAL
+        return LogLevel(min(route.min_level for route in self.routes))
+
+    def append(self, log_message: LogMessage):
+        for route in self.routes:
+            if route.accepts(log_message):
+                route.appender.append(log_message)
+
+    def append_batch(self, log_messages: List[LogMessage]):
+        for route in self.routes:
+            accepted = [log_message for log_message in log_messages if route.accepts(log_message)]
+            if accepted:
+                route.appender.append_batch(accepted)
+
+    def close(self):
+        for route in self.routes:
+            route.appender.close()
+
+
+class QueueAppender(LogAppender):
+    def __init__(self, queue, batch_size: int = 256, flush_interval: float = 0.1):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.closed = False
+        self.lock = Lock()
+        self.timer = Condition(self.lock)
+        self.flusher = Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+        atexit.register(self.close)
+
+    # Records cross the process boundary as plain tuples, batched to amortize pickling and pipe writes.
+    def append(self, log_message: LogMessage):
+        record = (log_message.get_level().value, log_message.get_message(), log_message.timestamp, log_message.get_fields())
+        with self.lock:
+            if self.closed:
+                raise Exception("Appender is closed")
+            self.buffer.append(record)
+            if len(self.buffer) < self.batch_size:
+                return
+            self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._flush()
+            self.timer.notify()
+        self.flusher.join()
+
+    def _flush(self):
+        if self.buffer:
+            self.queue.put(self.buffer)
+            self.buffer = []
+
+    def _flush_periodically(self):
+        with self.lock:
+            while not self.closed:
+                self.timer.wait(self.flush_interval)
+                self._flush()
+
+
+class LogWriterProcess:
+    def __init__(self, appender_factory, queue_size: int = 1024):
+        self.appender_factory = appender_factory
+        self.queue = multiprocessing.Queue(queue_size)
+        self.process = None
+
+    def get_queue(self):
+        return self.queue
+
+    def create_appender(self, batch_size: int = 256, flush_interval: float = 0.1) -> QueueAppender:
+        return QueueAppender(self.queue, batch_size, flush_interval)
+
+    def start(self):
+        self.process = multiprocessing.Process(target=LogWriterProcess._serve, args=(self.queue, self.appender_factory), daemon=True)
+        self.process.start()
+
+    # Call once every worker has closed its QueueAppender; the writer drains the queue before exiting.
+    def stop(self):
+        self.queue.put(None)
+        self.process.join()
+
+    # The writer owns the real appenders. Each worker's batches arrive in the order that worker sent them.
+    @staticmethod
+    def _serve(queue, appender_factory):
+        appender = appender_factory()
+        try:
+            while True:
+                batch = queue.get()
+                if batch is None:
+                    break
+                log_messages = []
+                for level, message, timestamp, fields in batch:
+                    log_message = LogMessage(LogLevel(level), message, fields=fields)
+                    log_message.timestamp = timestamp
+                    log_messages.append(log_message)
+                appender.append_batch(log_messages)
+        finally:
+            appender.close()
+
+
+class RateLimiter:
+    def __init__(self, rate: float = 10.0, burst: int = 20, max_templates: int = 10000, summary_interval: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_templates = max_templates
+        self.summary_interval = summary_interval
+        # (level value, template) -> [tokens, last refill time, suppressed count]
+        self.buckets = OrderedDict()
+        self.pending = set()
+        self.summary_handler = None
+        self.closed = False
+        self.lock = Lock()
+        self.timer = Condition(self.lock)
+        self.reporter = Thread(target=self._report_periodically, daemon=True)
+        self.reporter.start()
+        atexit.register(self.close)
+
+    def set_summary_handler(self, summary_handler):
+        self.summary_handler = summary_handler
+
+    # Repeats beyond the burst are counted instead of emitted. The count is reported, as a summary, every
+    # summary_interval, or earlier just before the next message of that template that gets through or
+    # when the template is evicted. Summaries are emitted outside the lock so a slow appender does not
+    # serialize every logging thread.
+    def allow(self, level: LogLevel, template: str) -> bool:
+        key = (level.value, template)
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                summary = None
+                if len(self.buckets) >= self.max_templates:
+                    evicted_key, evicted = self.buckets.popitem(last=False)
+                    summary = self._take_summary(evicted_key, evicted)
+                self.buckets[key] = [self.burst - 1, now, 0]
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    bucket[2] += 1
+                    self.pending.add(key)
+                    return False
+                bucket[0] -= 1
+                summary = self._take_summary(key, bucket)
+
+        if summary is not None:
+            self._report([summary])
+        return True
+
+    def flush(self):
+        with self.lock:
+            summaries = [self._take_summary(key, self.buckets[key]) for key in list(self.pending)]
+        self._report(summaries)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.timer.notify()
+        self.reporter.join()
+        self.flush()
+
+    def _report_periodically(self):
+        while True:
+            with self.lock:
+                self.timer.wait(self.summary_interval)
+                if self.closed:
+                    return
+            self.flush()
+
+    def _take_summary(self, key, bucket):
+        self.pending.discard(key)
+        count = bucket[2]
+        bucket[2] = 0
+        return (LogLevel(key[0]), key[1], count) if count else None
+
+    def _report(self, summaries):
+        summary_handler = self.summary_handler
+        if summary_handler is None:
+            return
+        for summary in summaries:
+            summary_handler(*summary)
+
+
 class LoggerConfig:
     def __init__(self, log_level: LogLevel, log_appender: LogAppender):
         self.log_level = log_level
         self.log_appender = log_appender
+        self.listeners = []
 
     def get_log_level(self):
         return self.log_level
     
     def set_log_level(self, log_level: LogLevel):
         self.log_level = log_level
+        self._notify()
 
     def get_log_appender(self):
         return self.log_appender
     
     def set_log_appender(self, log_appender: LogAppender):
         self.log_appender = log_appender
+        self._notify()
+
+    # Promotes a single appender to a RoutingAppender the first time a second sink is added.
+    def add_appender(
+        self,
+        log_appender: LogAppender,
+        min_level: LogLevel = LogLevel.DEBUG,
+        predicate=None,
+        isolated: bool = False,
+        capacity: int = 10000,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_DEBUG_FIRST
+    ) -> AppenderRoute:
+        if not isinstance(self.log_appender, RoutingAppender):
+            routing_appender = RoutingAppender()
+            routing_appender.add_appender(self.log_appender)
+            self.log_appender = routing_appender
+        route = self.log_appender.add_appender(
+            log_appender, min_level, predicate, isolated, capacity, overflow_policy
+        )
+        self._notify()
+        return route
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener(self)
 
 
 class Logger:
@@ -108,7 +1023,9 @@ class Logger:
             raise Exception("This class is a singleton!")
         
         Logger._instance = self
-        self.config = LoggerConfig(LogLevel.INFO, ConsoleAppender())
+        self.config = None
+        self.rate_limiter = None
+        self.set_config(LoggerConfig(LogLevel.INFO, ConsoleAppender()))
 
     @staticmethod
     def get_instance():
@@ -117,27 +1034,65 @@ class Logger:
         return Logger._instance
     
     def set_config(self, config: LoggerConfig):
+        if self.config is not None:
+            self.config.remove_listener(self._on_config_change)
         self.config = config
+        config.add_listener(self._on_config_change)
+        self._on_config_change(config)
+
+    # Level and appender are cached so a filtered call is a single attribute check; Enum.value is a
+    # property lookup, too slow to repeat on every disabled call.
+    def _on_config_change(self, config: LoggerConfig):
+        self.threshold = config.get_log_level().value
+        self.debug_enabled = self.threshold <= LogLevel.DEBUG.value
+        self.info_enabled = self.threshold <= LogLevel.INFO.value
+        self.warning_enabled = self.threshold <= LogLevel.WARNING.value
+        self.error_enabled = self.threshold <= LogLevel.ERROR.value
+        self.fatal_enabled = self.threshold <= LogLevel.FATAL.value
+        self.appender = config.get_log_appender()
+
+    def is_enabled_for(self, level: LogLevel):
+        return level.value >= self.threshold
+
+    # The previous limiter is closed first so its pending summaries are not lost.
+    def set_rate_limiter(self, rate_limiter: RateLimiter):
+        if self.rate_limiter is not None and self.rate_limiter is not rate_limiter:
+            self.rate_limiter.close()
+        self.rate_limiter = rate_limiter
+        if rate_limiter is not None:
+            rate_limiter.set_summary_handler(self._emit_summary)
 
-    def log(self, level: LogLevel, message: str):
-        if level.value >= self.config.get_log_level().value:
-            log_message = LogMessage(level, message)
-            self.config.get_log_appender().append(log_message)
+    def log(self, level: LogLevel, message: str, *args, **fields):
+        if level.value >= self.threshold:
+            self._emit(level, message, args, fields)
 
-    def debug(self, message):
-        self.log(LogLevel.DEBUG, message)
+    def debug(self, message, *args, **fields):
+        if self.debug_enabled:
+            self._emit(LogLevel.DEBUG, message, args, fields)
 
-    def info(self, message):
-        self.log(LogLevel.INFO, message)
+    def info(self, message, *args, **fields):
+        if self.info_enabled:
+            self._emit(LogLevel.INFO, message, args, fields)
 
-    def warning(self, message):
-        self.log(LogLevel.WARNING, message)
+    def warning(self, message, *args, **fields):
+        if self.warning_enabled:
+            self._emit(LogLevel.WARNING, message, args, fields)
 
-    def error(self, message):
-        self.log(LogLevel.ERROR, message)
+    def error(self, message, *args, **fields):
+        if self.error_enabled:
+            self._emit(LogLevel.ERROR, message, args, fields)
 
-    def fatal(self, message):
-        self.log(LogLevel.FATAL, message)
+    def fatal(self, message, *args, **fields):
+        if self.fatal_enabled:
+            self._emit(LogLevel.FATAL, message, args, fields)
+
+    def _emit(self, level: LogLevel, message: str, args: tuple, fields: dict):
+        if self.rate_limiter is not None and not self.rate_limiter.allow(level, message):
+            return
+        self.appender.append(LogMessage(level, message, args, fields))
+
+    def _emit_summary(self, level: LogLevel, template: str, count: int):
+        self.appender.append(LogMessage(level, "Previous message repeated %d times: %s", (count, template)))
 
 
 class LoggerDemo:
@@ -156,5 +1111,200 @@ class LoggerDemo:
         logger.debug("This is a debug message")
         logger.info("This is an info message")
 
+class FormattingAppender(LogAppender):
+    def __init__(self):
+        self.bytes_formatted = 0
+
+    def append(self, log_message: LogMessage):
+        self.bytes_formatted += len(str(log_message))
+
+
+class CountingStream:
+    def __init__(self):
+        self.bytes_written = 0
+
+    def write(self, text: str):
+        self.bytes_written += len(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class LoggerBenchmark:
+    DIRECTORY = "./logging_framework/"
+    PREFIX = "benchmark"
+
+    # Usage: logging_framework.py benchmark [records per producer] [output JSON path]
+    @staticmethod
+    def run(argv: List[str] = ()):
+        count = int(argv[0]) if len(argv) > 0 else 20000
+        output_path = argv[1] if len(argv) > 1 else None
+
+        appender_results = []
+        for name, factory in LoggerBenchmark._scenarios():
+            for producers in (1, 4):
+                appender_results.append(LoggerBenchmark.run_scenario(name, factory, producers, count))
+
+        report = {
+            "created_at": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "cpu_count": os.cpu_count(),
+            "records_per_producer": count,
+            "appenders": appender_results,
+            "micro": LoggerBenchmark.run_micro(count * 10) + [
+                LoggerBenchmark.run_multiprocess(workers, count) for workers in (1, 2, 4)
+            ]
+        }
+
+        text = json.dumps(report, indent=2)
+        if output_path is None:
+            print(text)
+        else:
+            with open(output_path, "w") as file:
+                file.write(text + "\n")
+
+    @staticmethod
+    def _scenarios():
+        db_path = LoggerBenchmark.DIRECTORY + LoggerBenchmark.PREFIX + ".db"
+
+        def routing():
+            routing_appender = RoutingAppender()
+            routing_appender.add_appender(RollingFileAppender("benchmark.log", compress=False))
+            routing_appender.add_appender(DatabaseAppender(db_path), LogLevel.WARNING, isolated=True)
+            return routing_appender
+
+        return [
+            ("console", ConsoleAppender),
+            ("file", lambda: FileAppender("benchmark.log")),
+            ("rolling_file", lambda: RollingFileAppender("benchmark.log", compress=False)),
+            ("async_file", lambda: AsyncAppender(FileAppender("benchmark.log"))),
+            ("async_rolling_file", lambda: AsyncAppender(RollingFileAppender("benchmark.log", compress=False))),
+            ("binary_file", lambda: BinaryFileAppender("benchmark.bin")),
+            ("database", lambda: DatabaseAppender(db_path)),
+            ("async_database", lambda: AsyncAppender(DatabaseAppender(db_path))),
+            ("routing_file_and_database", routing),
+        ]
+
+    @staticmethod
+    def run_scenario(name: str, factory, producers: int, count: int) -> dict:
+        logger = Logger.get_instance()
+        stream = CountingStream()
+        latencies = [[] for _ in range(producers)]
+
+        with contextlib.redirect_stdout(stream):
+            appender = factory()
+            logger.set_config(LoggerConfig(LogLevel.INFO, appender))
+            threads = [
+                Thread(target=LoggerBenchmark._produce, args=(logger, count, latencies[i]))
+                for i in range(producers)
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            appender.close()
+            elapsed = time.perf_counter() - start
+
+        all_latencies = sorted(latency for producer in latencies for latency in producer)
+        return {
+            "appender": name,
+            "producers": producers,
+            "records": producers * count,
+            "elapsed_sec": round(elapsed, 4),
+            "records_per_sec": round(producers * count / elapsed),
+            "p50_us": round(all_latencies[len(all_latencies) // 2] / 1000, 2),
+            "p99_us": round(all_latencies[int(len(all_latencies) * 0.99)] / 1000, 2),
+            "bytes_written": stream.bytes_written + LoggerBenchmark._remove_output_files()
+        }
+
+    @staticmethod
+    def _produce(logger: Logger, count: int, latencies: List[int]):
+        for i in range(count):
+            start = time.perf_counter_ns()
+            logger.info("benchmark message %d", i)
+            latencies.append(time.perf_counter_ns() - start)
+
+    @staticmethod
+    def _remove_output_files() -> int:
+        total = 0
+        for file_name in os.listdir(LoggerBenchmark.DIRECTORY):
+            if file_name.startswith(LoggerBenchmark.PREFIX):
+                total += os.path.getsize(LoggerBenchmark.DIRECTORY + file_name)
+                os.remove(LoggerBenchmark.DIRECTORY + file_name)
+        return total
+
+    @staticmethod
+    def run_micro(count: int) -> List[dict]:
+        logger = Logger.get_instance()
+        logger.set_config(LoggerConfig(LogLevel.INFO, FormattingAppender()))
+
+        def per_call(call) -> float:
+            start = time.perf_counter_ns()
+            for i in range(count):
+                call(i)
+            return round((time.perf_counter_ns() - start) / count, 1)
+
+        results = [
+            {"benchmark": "disabled_debug_call", "ns_per_call": per_call(lambda i: logger.debug("disabled message %d", i))},
+            {"benchmark": "enabled_info_call", "ns_per_call": per_call(lambda i: logger.info("enabled message %d", i))},
+        ]
+
+        logger.set_rate_limiter(RateLimiter())
+        results.append({
+            "benchmark": "rate_limited_repeated_call",
+            "ns_per_call": per_call(lambda i: logger.error("connection refused to %s", "db-1"))
+        })
+        results.append({
+            "benchmark": "rate_limited_distinct_call",
+            "ns_per_call": per_call(lambda i: logger.info(f"distinct message {i}"))
+        })
+        logger.set_rate_limiter(None)
+        return results
+
+    @staticmethod
+    def run_multiprocess(workers: int, count: int) -> dict:
+        writer = LogWriterProcess(LoggerBenchmark._create_multiprocess_appender)
+        writer.start()
+
+        start = time.perf_counter()
+        processes = [
+            multiprocessing.Process(target=LoggerBenchmark._log_from_worker, args=(writer.get_queue(), worker, count))
+            for worker in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        writer.stop()
+        elapsed = time.perf_counter() - start
+
+        return {
+            "benchmark": "multiprocess_writer",
+            "workers": workers,
+            "records_per_sec": round(workers * count / elapsed),
+            "bytes_written": LoggerBenchmark._remove_output_files()
+        }
+
+    @staticmethod
+    def _create_multiprocess_appender():
+        return RollingFileAppender("benchmark.log", compress=False)
+
+    @staticmethod
+    def _log_from_worker(queue, worker: int, count: int):
+        appender = QueueAppender(queue)
+        logger = Logger.get_instance()
+        logger.set_config(LoggerConfig(LogLevel.INFO, appender))
+        for i in range(count):
+            logger.info("worker %d message %d", worker, i)
+        appender.close()
+
+
 if __name__ == "__main__":
-    LoggerDemo.run()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        LoggerBenchmark.run(sys.argv[2:])
+    elif len(sys.argv) > 2 and sys.argv[1] == "query":
+        BinaryLogQueryTool.run(sys.argv[2:])
+    else:
+        LoggerDemo.run()
\ No newline at end of file
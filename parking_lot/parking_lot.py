@@ -1,7 +1,9 @@
 from __future__ import annotations
 from enum import Enum
 from abc import ABC, abstractmethod
-from typing import List
+from threading import Lock
+from typing import Dict, List, Optional
+import heapq
 
 # The parking lot should have multiple levels, each level with a certain number of parking spots.
 # The parking lot should support different types of vehicles, such as cars, motorcycles, and trucks.
@@ -19,6 +21,12 @@ class ParkingLot:
         else:
             ParkingLot._instance = self
             self.levels: List[Level] = []
+            # Per vehicle type, a min-heap of level indices that may have a free spot. Full levels are
+            # dropped lazily when they reach the top, so allocation is O(log levels) amortized.
+            self.available_levels: Dict[VehicleType, List[int]] = {vehicle_type: [] for vehicle_type in VehicleType}
+            self.queued_levels: Dict[VehicleType, set] = {vehicle_type: set() for vehicle_type in VehicleType}
+            self.vehicle_levels: Dict[Vehicle, int] = {}
+            self.lock = Lock()
 
     @staticmethod
     def get_instance():
@@ -27,21 +35,42 @@ class ParkingLot:
         return ParkingLot._instance
     
     def add_level(self, level: Level):
-        self.levels.append(level)
+        with self.lock:
+            self.levels.append(level)
+            for vehicle_type in VehicleType:
+                self._queue_level(len(self.levels) - 1, vehicle_type)
 
     def park_vehicle(self, vehicle: Vehicle) -> bool:
-        for level in self.levels:
-            if level.park_vehicle(vehicle):
-                return True
-            
-        return False
-    
+        vehicle_type = vehicle.get_vehicle_type()
+        with self.lock:
+            if vehicle in self.vehicle_levels:
+                return False
+            heap = self.available_levels[vehicle_type]
+            while heap:
+                if self.levels[heap[0]].park_vehicle(vehicle):
+                    self.vehicle_levels[vehicle] = heap[0]
+                    return True
+                self.queued_levels[vehicle_type].discard(heapq.heappop(heap))
+
+            return False
+
     def unpark_vehicle(self, vehicle: Vehicle) -> bool:
-        for level in self.levels:
-            if level.unpark_vehicle(vehicle):
-                return True
-            
-        return False
+        with self.lock:
+            index = self.vehicle_levels.pop(vehicle, None)
+            if index is None or not self.levels[index].unpark_vehicle(vehicle):
+                return False
+            # A freed generic spot can take any vehicle type, so the level is requeued for all of them.
+            for vehicle_type in VehicleType:
+                self._queue_level(index, vehicle_type)
+            return True
+
+    def get_available_spots(self, vehicle_type: VehicleType) -> int:
+        return sum(level.get_available_spots(vehicle_type) for level in self.levels)
+
+    def _queue_level(self, index: int, vehicle_type: VehicleType):
+        if index not in self.queued_levels[vehicle_type] and self.levels[index].has_space(vehicle_type):
+            self.queued_levels[vehicle_type].add(index)
+            heapq.heappush(self.available_levels[vehicle_type], index)
     
     def display_availability(self) -> None:
         for level in self.levels:
@@ -49,26 +78,51 @@ class ParkingLot:
 
 
 class Level:
-    def __init__(self, floor: int, total_spots: int):
+    # spot_types maps a vehicle type to how many of the level's spots are reserved for it; the
+    # remaining spots are generic and accept any vehicle.
+    def __init__(self, floor: int, total_spots: int, spot_types: Optional[Dict[VehicleType, int]] = None):
         self.floor = floor
-        self.parking_spots: List[ParkingSpot] = [ParkingSpot(i) for i in range(total_spots)]
+        self.parking_spots: List[ParkingSpot] = []
+        for vehicle_type, count in (spot_types or {}).items():
+            self.parking_spots.extend([ParkingSpot(len(self.parking_spots) + i, vehicle_type) for i in range(count)])
+        if len(self.parking_spots) > total_spots:
+            raise Exception("More typed spots than total spots on this level")
+        self.parking_spots.extend(ParkingSpot(i) for i in range(len(self.parking_spots), total_spots))
+        # Free spot numbers per spot type (None for generic), popped from the end so the lowest
+        # numbered spot is handed out first.
+        self.free_spots: Dict[Optional[VehicleType], List[int]] = {None: []}
+        for vehicle_type in VehicleType:
+            self.free_spots[vehicle_type] = []
+        for spot in reversed(self.parking_spots):
+            self.free_spots[spot.get_parking_spot_vehicle_type()].append(spot.get_spot_number())
+        self.occupied_spots: Dict[Vehicle, ParkingSpot] = {}
 
     def park_vehicle(self, vehicle: Vehicle) -> bool:
-        for spot in self.parking_spots:
-            if spot.is_available():
+        vehicle_type = vehicle.get_vehicle_type()
+        for spot_type in (vehicle_type, None):
+            free_spots = self.free_spots[spot_type]
+            if free_spots:
+                spot = self.parking_spots[free_spots.pop()]
                 spot.park_vehicle(vehicle)
+                self.occupied_spots[vehicle] = spot
                 return True
-            
+
         return False
-    
+
     def unpark_vehicle(self, vehicle: Vehicle) -> bool:
-        for spot in self.parking_spots:
-            if not spot.is_available() and spot.get_parked_vehicle() == vehicle:
-                spot.unpark_vehicle()
-                return True
-            
-        return False
-    
+        spot = self.occupied_spots.pop(vehicle, None)
+        if spot is None:
+            return False
+        spot.unpark_vehicle()
+        self.free_spots[spot.get_parking_spot_vehicle_type()].append(spot.get_spot_number())
+        return True
+
+    def has_space(self, vehicle_type: VehicleType) -> bool:
+        return bool(self.free_spots[vehicle_type] or self.free_spots[None])
+
+    def get_available_spots(self, vehicle_type: VehicleType) -> int:
+        return len(self.free_spots[vehicle_type]) + len(self.free_spots[None])
+
     def display_availability(self) -> None:
         print(f"Level {self.floor} Availability:")
         for spot in self.parking_spots:
@@ -76,29 +130,32 @@ class Level:
 
 
 class ParkingSpot:
-    def __init__(self, spot_number: int):
+    def __init__(self, spot_number: int, vehicle_type: Optional[VehicleType] = None):
         self.spot_number = spot_number
-        self.vehicle_type = None
+        self.vehicle_type = vehicle_type
         self.is_occupied = False
         self.parked_vehicle = None
 
     def is_available(self):
         return not self.is_occupied
     
+    def can_fit_vehicle(self, vehicle: Vehicle) -> bool:
+        return self.vehicle_type is None or self.vehicle_type == vehicle.get_vehicle_type()
+
     def park_vehicle(self, vehicle: Vehicle):
-        if self.is_available():
-            self.is_occupied = True
-            self.vehicle_type = vehicle.get_vehicle_type()
-            self.parked_vehicle = vehicle
-        else:
+        if not self.is_available():
             raise Exception("Parking spot is not available")
+        if not self.can_fit_vehicle(vehicle):
+            raise Exception("Parking spot does not accommodate this vehicle type")
+        self.is_occupied = True
+        self.parked_vehicle = vehicle
         
     def unpark_vehicle(self):
         if self.is_available():
             raise Exception("Parking spot is already available")
         
         self.is_occupied = False
-        self.vehicle_type = None
+        self.parked_vehicle = None
 
     def get_parking_spot_vehicle_type(self):
         return self.vehicle_type
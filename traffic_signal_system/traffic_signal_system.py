@@ -1,6 +1,8 @@
 import __future__ as annotations
 import threading
 from enum import Enum
+from typing import Dict, List, Tuple
+import heapq
 import time
 
 class Signal(Enum):
@@ -14,22 +16,66 @@ class TrafficLight:
         id: int, 
         red_duration: int, 
         yellow_duration: int, 
-        green_duration: int
+        green_duration: int,
+        offset: int = 0
     ):
         self.id = id
         self.red_duration = red_duration
         self.yellow_duration = yellow_duration
         self.green_duration = green_duration
+        self.offset = offset
         self.current_signal = Signal.RED
+        self.preempted = False
         self.lock = threading.Lock()
 
     def change_signal(self, new_signal: Signal):
         with self.lock:
             self.current_signal = new_signal
 
+    # Checked and set under one lock so a preemption that lands in between is never overwritten.
+    def change_scheduled_signal(self, new_signal: Signal) -> bool:
+        with self.lock:
+            if self.preempted:
+                return False
+            self.current_signal = new_signal
+            return True
+
     def get_current_signal(self):
         return self.current_signal
 
+    def set_preempted(self, preempted: bool):
+        with self.lock:
+            self.preempted = preempted
+
+    def is_preempted(self):
+        return self.preempted
+
+    def get_cycle_duration(self):
+        return self.green_duration + self.yellow_duration + self.red_duration
+
+    # The coordinated cycle is GREEN -> YELLOW -> RED, starting at `offset` ms after the controller epoch.
+    def get_scheduled_signal(self, elapsed: float) -> Signal:
+        position = (elapsed - self.offset) % self.get_cycle_duration()
+        if position < self.green_duration:
+            return Signal.GREEN
+        if position < self.green_duration + self.yellow_duration:
+            return Signal.YELLOW
+        return Signal.RED
+
+    def get_time_to_next_phase(self, elapsed: float) -> float:
+        position = (elapsed - self.offset) % self.get_cycle_duration()
+        for boundary in (self.green_duration, self.green_duration + self.yellow_duration, self.get_cycle_duration()):
+            if position < boundary:
+                return boundary - position
+        return self.get_cycle_duration() - position
+
+    def get_scheduled_green_time(self, start: float, end: float) -> float:
+        return self._green_time_until(end) - self._green_time_until(start)
+
+    def _green_time_until(self, elapsed: float) -> float:
+        full_cycles, position = divmod(elapsed - self.offset, self.get_cycle_duration())
+        return full_cycles * self.green_duration + min(position, self.green_duration)
+
 class Road:
     def __init__(self, id: int, name: str):
         self.id = id
@@ -44,6 +90,157 @@ class Road:
 
     def get_id(self):
         return self.id
+
+
+class PreemptionReport:
+    def __init__(self, preemption_id: int, vehicle_id: str, road_ids: List[int]):
+        self.preemption_id = preemption_id
+        self.vehicle_id = vehicle_id
+        self.road_ids = road_ids
+        self.lost_green_time = 0.0
+        self.lost_vehicles = 0.0
+        self.completed_roads = 0
+
+    def is_completed(self):
+        return self.completed_roads == len(self.road_ids)
+
+    def __str__(self):
+        return (f"Preemption {self.preemption_id} ({self.vehicle_id}): roads={self.road_ids} "
+                f"lost_green={self.lost_green_time / 1000:.1f}s lost_vehicles={self.lost_vehicles:.1f}")
+
+
+class PreemptionScheduler:
+    ACTIVATE = 0
+    RELEASE = 1
+    RESTORE = 2
+
+    def __init__(
+        self,
+        controller: "TrafficController",
+        lead_time: int = 10000,
+        clearance_time: int = 3000,
+        saturation_flow: float = 0.5
+    ):
+        self.controller = controller
+        self.lead_time = lead_time
+        self.clearance_time = clearance_time
+        self.saturation_flow = saturation_flow
+        self.events: List[Tuple[float, int, int, int, int]] = []
+        self.reports: Dict[int, PreemptionReport] = {}
+        self.windows: Dict[int, List[Tuple[float, float]]] = {}
+        self.active_counts: Dict[int, int] = {}
+        self.sequence = 0
+        self.preemption_counter = 0
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+
+    # `etas` are the vehicle's arrival times at each road, in ms from now, in route order.
+    def preempt_route(self, vehicle_id: str, road_ids: List[int], etas: List[int]) -> int:
+        if len(road_ids) != len(etas):
+            raise Exception("Each road on the route needs an ETA")
+        if any(later < earlier for earlier, later in zip(etas, etas[1:])):
+            raise Exception("ETAs must follow the route order")
+
+        # Every road is resolved before any state changes, so an unknown road leaves nothing half-preempted.
+        lights = [self.controller.get_road(road_id).get_traffic_light() for road_id in road_ids]
+
+        now = self.controller.get_elapsed_time()
+        with self.condition:
+            self.preemption_counter += 1
+            preemption_id = self.preemption_counter
+            report = PreemptionReport(preemption_id, vehicle_id, list(road_ids))
+            self.reports[preemption_id] = report
+
+            for road_id, light, eta in zip(road_ids, lights, etas):
+                start = now + max(eta - self.lead_time, 0)
+                end = now + eta + self.clearance_time
+                report.lost_green_time += self._marginal_lost_time(road_id, light, start, end)
+                self.windows.setdefault(road_id, []).append((start, end))
+                self._push_event(start, self.ACTIVATE, road_id, light, preemption_id)
+                self._push_event(end, self.RELEASE, road_id, light, preemption_id)
+
+            report.lost_vehicles = report.lost_green_time / 1000 * self.saturation_flow
+            self.condition.notify()
+
+        return preemption_id
+
+    def get_report(self, preemption_id: int) -> PreemptionReport:
+        return self.reports[preemption_id]
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def run_pending(self, now: float):
+        with self.condition:
+            while self.events and self.events[0][0] <= now:
+                _, _, action, road_id, light, preemption_id = heapq.heappop(self.events)
+                # One failing event must not stop the scheduler thread; later events still fire.
+                try:
+                    self._apply(action, road_id, light, preemption_id, now)
+                except Exception:
+                    print(f"An error occurred while applying preemption {preemption_id} on road {road_id}")
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.events:
+                    timeout = max(self.events[0][0] - self.controller.get_elapsed_time(), 0) / 1000
+                    self.condition.wait(timeout)
+                else:
+                    self.condition.wait()
+            self.run_pending(self.controller.get_elapsed_time())
+
+    # Events carry the light resolved when the route was scheduled, so removing the road later
+    # still lets a started preemption release and restore its light.
+    def _push_event(self, at: float, action: int, road_id: int, light: TrafficLight, preemption_id: int):
+        self.sequence += 1
+        heapq.heappush(self.events, (at, self.sequence, action, road_id, light, preemption_id))
+
+    def _apply(self, action: int, road_id: int, light: TrafficLight, preemption_id: int, now: float):
+
+        if action == self.ACTIVATE:
+            self.active_counts[road_id] = self.active_counts.get(road_id, 0) + 1
+            light.set_preempted(True)
+            light.change_signal(Signal.GREEN)
+        elif action == self.RELEASE:
+            self.active_counts[road_id] -= 1
+            self.windows[road_id] = [w for w in self.windows[road_id] if w[1] > now]
+            self.reports[preemption_id].completed_roads += 1
+            if self.active_counts[road_id] > 0:
+                return
+            # Hand straight back if the cycle is green here; otherwise clear with yellow first.
+            if light.get_scheduled_signal(now) == Signal.GREEN:
+                light.set_preempted(False)
+            else:
+                light.change_signal(Signal.YELLOW)
+                self._push_event(now + light.yellow_duration, self.RESTORE, road_id, light, preemption_id)
+        elif action == self.RESTORE:
+            if self.active_counts[road_id] > 0:
+                return
+            light.change_signal(light.get_scheduled_signal(now))
+            light.set_preempted(False)
+
+    # Green held outside the coordinated green phase is time taken from conflicting movements.
+    # Parts of the window already covered by another preemption on the same road are not charged twice.
+    def _marginal_lost_time(self, road_id: int, light: TrafficLight, start: float, end: float) -> float:
+        uncovered = [(start, end)]
+        for covered_start, covered_end in self.windows.get(road_id, []):
+            remaining = []
+            for s, e in uncovered:
+                if covered_end <= s or covered_start >= e:
+                    remaining.append((s, e))
+                    continue
+                if s < covered_start:
+                    remaining.append((s, covered_start))
+                if covered_end < e:
+                    remaining.append((covered_end, e))
+            uncovered = remaining
+
+        lost = sum((e - s) - light.get_scheduled_green_time(s, e) for s, e in uncovered)
+        if any(e == end for _, e in uncovered) and light.get_scheduled_signal(end) != Signal.GREEN:
+            lost += light.yellow_duration
+        return lost
+
     
 class TrafficController:
     _instance = None
@@ -54,6 +251,8 @@ class TrafficController:
             if cls._instance is None:
                 cls._instance = super().__new__(cls)
                 cls._instance.roads = {}
+                cls._instance.epoch = time.monotonic()
+                cls._instance.preemption_scheduler = PreemptionScheduler(cls._instance)
         return cls._instance
     
     @classmethod
@@ -69,20 +268,28 @@ class TrafficController:
         
         del self.roads[road.get_id()]
 
+    def get_road(self, road_id: int):
+        if road_id not in self.roads:
+            raise Exception("Road not found")
+
+        return self.roads[road_id]
+
+    def get_elapsed_time(self):
+        return (time.monotonic() - self.epoch) * 1000
+
     def start_traffic_control(self):
         for road in self.roads.values():
             traffic_light = road.get_traffic_light()
-            threading.Thread(target=self._control_traffic_light, args=(traffic_light), daemon=True).start()
+            threading.Thread(target=self._control_traffic_light, args=(traffic_light,), daemon=True).start()
+        self.preemption_scheduler.start()
 
+    # Phases are derived from the shared epoch, so a light leaving preemption rejoins the coordinated cycle in step.
     def _control_traffic_light(self, traffic_light: TrafficLight):
         while True:
             try:
-                time.sleep(traffic_light.red_duration / 1000)
-                traffic_light.change_signal(Signal.GREEN)
-                time.sleep(traffic_light.yellow_duration / 1000)
-                traffic_light.change_signal(Signal.YELLOW)
-                time.sleep(traffic_light.red_duration / 1000)
-                traffic_light.change_signal(Signal.RED)
+                elapsed = self.get_elapsed_time()
+                traffic_light.change_scheduled_signal(traffic_light.get_scheduled_signal(elapsed))
+                time.sleep(traffic_light.get_time_to_next_phase(elapsed) / 1000)
             except:
                 print("An error occurred while controlling traffic light")
 
@@ -93,6 +300,12 @@ class TrafficController:
             traffic_light = road.get_traffic_light()
             traffic_light.change_signal(Signal.RED)
 
+    def preempt_route(self, vehicle_id: str, road_ids: List[int], etas: List[int]) -> int:
+        return self.preemption_scheduler.preempt_route(vehicle_id, road_ids, etas)
+
+    def get_preemption_report(self, preemption_id: int) -> PreemptionReport:
+        return self.preemption_scheduler.get_report(preemption_id)
+
 class TrafficSignalSystemDemo:
     @staticmethod
     def run():
@@ -104,8 +317,8 @@ class TrafficSignalSystemDemo:
         road4 = Road(4, "Park Avenue")
 
         traffic_light1 = TrafficLight(1, 30000, 5000, 30000)
-        traffic_light2 = TrafficLight(2, 30000, 5000, 30000)
-        traffic_light3 = TrafficLight(3, 30000, 5000, 30000)
+        traffic_light2 = TrafficLight(2, 30000, 5000, 30000, offset=20000)
+        traffic_light3 = TrafficLight(3, 30000, 5000, 30000, offset=40000)
         traffic_light4 = TrafficLight(4, 30000, 5000, 30000)
 
         road1.set_traffic_light(traffic_light1)
@@ -122,5 +335,10 @@ class TrafficSignalSystemDemo:
 
         traffic_controller.handle_emergency(2)
 
+        ambulance = traffic_controller.preempt_route("Ambulance-1", [1, 2, 3], [5000, 25000, 45000])
+        fire_truck = traffic_controller.preempt_route("FireTruck-7", [4, 3], [15000, 50000])
+        print(traffic_controller.get_preemption_report(ambulance))
+        print(traffic_controller.get_preemption_report(fire_truck))
+
 if __name__ == "__main__":
     TrafficSignalSystemDemo.run()
\ No newline at end of file